@@ -3,13 +3,16 @@ from itertools import product
 import numpy as np
 import random
 from scipy.optimize import linprog
+from ce_plan import choose_plan
 from typing import List, Dict, Callable, Union, Tuple
 
 class Correlated_equilibrium:
     strategies: List[str] = []
     players: List[str] = []
     utilities: Dict[str, Callable[[Dict[str, str]], float]] = {}
+    player_strategies: Dict[str, List[str]] = {}
     distribution: List[Dict[str, Union[float, Dict[str, str]]]] = None
+    solver_plan: Dict = None
 
     debug: bool = False
 
@@ -17,6 +20,8 @@ class Correlated_equilibrium:
         self.strategies = strategies
         self.players = []
         self.utilities = {}
+        self.player_strategies = {}
+        self.solver_plan = None
         self.debug = debug
 
     def get_lambdas(self) -> Dict[str, float]:
@@ -38,11 +43,11 @@ class Correlated_equilibrium:
         list: A list of dicts, where each dict represents a combination of strategies with keys being players and values their strategy.
         """
         # Check if there are players and strategies
-        if not self.players or not self.strategies:
+        if not self.players or not all(self.player_strategies.values()):
             return []
 
-        # Create a list of strategies for each player
-        player_strategies = [self.strategies for _ in self.players]
+        # Create a list of strategies for each player, the profile space is mixed-radix when their counts differ
+        player_strategies = [self.player_strategies[player] for player in self.players]
         # Use itertools.product to generate all combinations
         combinations = list(product(*player_strategies))
         combinations = [{self.players[i]: combination[i] for i in range(len(combination))} for combination in combinations]
@@ -64,14 +69,15 @@ class Correlated_equilibrium:
         Returns:
         tuple: A tuple containing the inequality constraint matrix (A_ub) and the inequality constraint vector (b_ub).
         """
-        num_constraints = len(self.players) * len(self.strategies) * (len(self.strategies) - 1)
+        # rows only exist for the (strategy, alternate) pairs of each player's own strategies
+        num_constraints = sum(len(self.player_strategies[player]) * (len(self.player_strategies[player]) - 1) for player in self.players)
         num_variables = len(self.distribution)
         A_ub = np.zeros((num_constraints, num_variables))
         b_ub = np.zeros(num_constraints)
         constraint_index = 0
         for player in self.players:
-            for strategy in self.strategies:
-                for alternate_strategy in self.strategies:
+            for strategy in self.player_strategies[player]:
+                for alternate_strategy in self.player_strategies[player]:
                     # each row in the A_ub matrix corresponds to a constraint for a given player to play a given strategy vs an alternate strategy, 
                     # where there is an entry for each strategy profile. the value of any index of the row is non-zero iff in the profile you are signaled to 
                     # play the given strategy, and the value is the difference in utility between the alternate strategy and the signaled strategy
@@ -92,6 +98,47 @@ class Correlated_equilibrium:
         return A_ub, b_ub
         
     
+    def build_cce_constraints(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Builds the coarse correlated equilibrium constraints for the linear program.
+        
+        Returns:
+        tuple: A tuple containing the inequality constraint matrix (A_ub) and the inequality constraint vector (b_ub).
+        """
+        num_constraints = sum(len(self.player_strategies[player]) for player in self.players)
+        num_variables = len(self.distribution)
+        A_ub = np.zeros((num_constraints, num_variables))
+        b_ub = np.zeros(num_constraints)
+        constraint_index = 0
+        for player in self.players:
+            for alternate_strategy in self.player_strategies[player]:
+                # each row corresponds to a player committing to a fixed alternate strategy before seeing their recommendation,
+                # so every profile contributes the difference in utility between the alternate strategy and the recommended one
+                for index, dist_entry in enumerate(self.distribution):
+                    profile = dist_entry["strategy"]
+                    if profile[player] != alternate_strategy:
+                        player_utility = self.utilities[player](profile)
+                        deviation_utility = self.utilities[player]({**profile, player: alternate_strategy})
+                        A_ub[constraint_index][index] = deviation_utility - player_utility
+                constraint_index += 1
+        if self.debug:
+            print("\nA_ub:\n", [",".join([str(round(x, 3)) for x in row]) + "\n" for row in A_ub])
+            print("\nb_ub:\n", b_ub)
+        return A_ub, b_ub
+
+    def plan_distribution(self, mode: str = "ce", memory_budget: Union[int, None] = None, time_budget: Union[float, None] = None) -> Dict:
+        """
+        Estimates the size of the LP, including the number of utility calls, and checks it fits the budgets
+        without allocating anything of size S^N.
+
+        Returns:
+        dict: The plan from ce_plan.choose_plan. Raises ValueError if the dense LP does not fit.
+        """
+        plan = choose_plan(tuple(len(self.player_strategies[player]) for player in self.players), mode, False, ("highs",), memory_budget, time_budget)
+        if self.debug:
+            print("\nSolver plan:\n", plan)
+        return plan
+
     def initialize_distribution(self):
         """
         Initializes the distribution with equal probability for each strategy combination.
@@ -102,10 +149,20 @@ class Correlated_equilibrium:
         if self.debug:
             print("\nDistribuiton initialized:\n", "\n".join([str(row) for row in self.distribution]))
 
-    def optimize_distribution(self):
+    def optimize_distribution(self, mode: str = "ce", memory_budget: Union[int, None] = None, time_budget: Union[float, None] = None):
         """
         Optimizes the distribution using linear programming.
-        """
+
+        Parameters:
+        mode (str): "ce" for a correlated equilibrium, "cce" for a coarse correlated equilibrium.
+        memory_budget (int): if given with or without time_budget, plan_distribution checks the LP fits before
+            anything is built. The plan is kept in solver_plan.
+        time_budget (float): the seconds allowed.
+        """
+        if mode not in ("ce", "cce"):
+            raise ValueError("Unknown equilibrium mode", mode)
+        if memory_budget is not None or time_budget is not None:
+            self.solver_plan = self.plan_distribution(mode, memory_budget, time_budget)
         # create a linear program
         if not self.distribution:
             self.initialize_distribution()
@@ -130,7 +187,7 @@ class Correlated_equilibrium:
         b_eq = np.array([1])
 
         # build IC constraints
-        A_ub, b_ub = self.build_ic_constraints()
+        A_ub, b_ub = self.build_ic_constraints() if mode == "ce" else self.build_cce_constraints()
         if self.debug:
             print("\n DIMENSIONS:\n", "A_ub:", np.shape(A_ub), "b_ub:", np.shape(b_ub), "A_eq:", np.shape(A_eq), "b_eq:", np.shape(b_eq))
         res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, method='highs')
@@ -161,13 +218,18 @@ class Correlated_equilibrium:
         print("WARNING: Rounding errors in sampling distribution, sum of probabilities is less than 1. Returning last strategy.")
         return self.distribution[-1]["strategy"]
 
-    def add_player(self, player: str, utility_function: Callable[[Dict[str, str]], float]):
+    def add_player(self, player: str, utility_function: Callable[[Dict[str, str]], float], strategies: Union[List[str], None] = None):
         """
-        Adds a player to the game with their utility function. Assumes strategies are the same for each player.
+        Adds a player to the game with their utility function.
+
+        Parameters:
+        strategies (list): the player's own strategies, the strategies the game was created with by default.
         """
         self.players.append(player)
         self.utilities[player] = utility_function
+        self.player_strategies[player] = self.strategies if strategies is None else strategies
         self.distribution = None
+        self.solver_plan = None
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
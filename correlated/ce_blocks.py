@@ -0,0 +1,161 @@
+# block decomposition of separable games into independent components
+#
+# when no player's utility depends on a player outside their own group, a product of correlated equilibria of the
+# groups is a correlated equilibrium of the whole game, and it maximizes welfare iff each factor does, so each group
+# is solved as its own smaller LP
+import random
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import List, Dict, Tuple, Union
+from ce_basic import Correlated_equilibrium as ce_basic
+from ce_fast import Correlated_equilibrium as ce_fast
+
+def find_independent_components(utilities: np.ndarray, tolerance: float = 0.0) -> List[List[int]]:
+    """
+    Finds groups of players whose utilities do not depend on anyone outside the group, from a ce_fast utility tensor.
+    Player n depends on player m when n's utility varies along m's axis by more than the tolerance.
+
+    Returns:
+    list: The connected components of the dependency graph, each a sorted list of player indices.
+    """
+    num_players = utilities.shape[0]
+    parent = list(range(num_players))
+    def find(n: int) -> int:
+        while parent[n] != n:
+            parent[n] = parent[parent[n]]
+            n = parent[n]
+        return n
+    for n in range(num_players):
+        for m in range(num_players):
+            if m != n and np.ptp(utilities[n], axis=m).max() > tolerance:
+                parent[find(n)] = find(m)
+    components = {}
+    for n in range(num_players):
+        components.setdefault(find(n), []).append(n)
+    return sorted(components.values())
+
+def solve_tensor_component(strategies: List[List[str]], players: List[str], utilities: np.ndarray, mode: str) -> np.ndarray:
+    """
+    Solves one component with ce_fast, given each of its players' strategies. Module level so it can run in a worker process.
+
+    Returns:
+    np.ndarray: The component's distribution as a tensor over its players' strategy profiles.
+    """
+    ce = ce_fast.from_utilities(strategies[0], players, utilities, player_strategies=strategies)
+    ce.optimize_distribution(mode)
+    return np.array([dist_entry[0] for dist_entry in ce.distribution]).reshape(utilities.shape[1:])
+
+def solve_callable_component(ce: ce_basic, players: List[str], mode: str) -> np.ndarray:
+    """
+    Solves one component of a ce_basic game. Players outside the component are fixed to the first strategy
+    when calling utilities, which is safe because no utility in the component depends on them.
+
+    Returns:
+    np.ndarray: The component's distribution as a tensor over its players' strategy profiles.
+    """
+    fixed = {player: ce.player_strategies[player][0] for player in ce.players}
+    component = ce_basic(ce.strategies, ce.debug)
+    for player in players:
+        utility = ce.utilities[player]
+        component.add_player(player, lambda profile, utility=utility: utility({**fixed, **profile}), ce.player_strategies[player])
+    distribution = component.optimize_distribution(mode)
+    return np.array([dist_entry["probability"] for dist_entry in distribution]).reshape(tuple(len(ce.player_strategies[player]) for player in players))
+
+class Product_distribution:
+    """
+    A distribution over full strategy profiles stored as independent per-component distributions.
+    The joint S^N tensor is never built; probabilities and samples are computed from the components on demand.
+    """
+    def __init__(self, player_map: List[str], strategy_maps: List[List[str]], components: List[Tuple[List[int], np.ndarray]], debug: bool = False):
+        self.player_map = player_map
+        self.strategy_maps = strategy_maps
+        self.components = components
+        self.cumulatives = [np.cumsum(np.maximum(probabilities, 0).ravel()) for _, probabilities in components]
+        self.debug = debug
+
+    def probability(self, profile: Dict[str, str]) -> float:
+        """
+        Returns:
+        float: The probability of a full profile of {player: strategy}, the product over the components.
+        """
+        probability = 1.0
+        for players, probabilities in self.components:
+            probability *= probabilities[tuple(self.strategy_maps[n].index(profile[self.player_map[n]]) for n in players)]
+        return probability
+
+    def get_component_distributions(self) -> List[Dict]:
+        """
+        Returns:
+        list: A list of dicts with the players of each component and their distribution as a tensor.
+        """
+        return [{"players": [self.player_map[n] for n in players], "probability": probabilities} for players, probabilities in self.components]
+
+    def sample_distribution(self) -> Dict[str, str]:
+        """
+        Samples a strategy by sampling each component independently.
+
+        Returns:
+        dict: A dictionary of {player: strategy} representing the sampled strategy.
+        """
+        sample = {}
+        for (players, probabilities), cumulative in zip(self.components, self.cumulatives):
+            index = min(int(np.searchsorted(cumulative, random.uniform(0, cumulative[-1]), side="left")), len(cumulative) - 1)
+            for n, strategy in zip(players, np.unravel_index(index, probabilities.shape)):
+                sample[self.player_map[n]] = self.strategy_maps[n][strategy]
+        if self.debug:
+            print("\nSampled strategy:", sample)
+        return sample
+
+def solve_by_components(ce: Union[ce_basic, ce_fast], partition: Union[List[List[str]], None] = None, mode: str = "ce",
+                        max_workers: Union[int, None] = None) -> Product_distribution:
+    """
+    Solves a separable game as independent smaller CEs in parallel.
+
+    Parameters:
+    ce: a ce_basic or ce_fast Correlated_equilibrium with its players added.
+    partition (list): groups of player names with no utility dependence across groups. Detected from the utility
+        tensor for ce_fast when not given; required for ce_basic, whose utilities are opaque callables.
+    mode (str): "ce" or "cce".
+    max_workers (int): the number of parallel solves, 1 to solve serially.
+
+    Returns:
+    Product_distribution: the product of the component equilibria.
+    """
+    tensor = isinstance(ce, ce_fast)
+    player_map = ce.player_map if tensor else ce.players
+    strategy_maps = ce.player_strategy_maps if tensor else [ce.player_strategies[player] for player in ce.players]
+    if partition is None:
+        if not tensor:
+            raise ValueError("A partition must be declared for games with callable utilities")
+        components = find_independent_components(ce.utilities)
+    else:
+        components = [sorted(player_map.index(player) for player in group) for group in partition]
+        if sorted(n for group in components for n in group) != list(range(len(player_map))):
+            raise ValueError("Partition must contain every player exactly once", partition)
+        if tensor:
+            detected = find_independent_components(ce.utilities)
+            if any(not any(set(group) <= set(component) for component in components) for group in detected):
+                raise ValueError("Partition splits players whose utilities depend on each other", partition)
+    if ce.debug:
+        print("\nComponents:", [[player_map[n] for n in component] for component in components])
+
+    if tensor:
+        jobs = []
+        for component in components:
+            # players outside the component do not matter, so their axes are fixed at the first strategy
+            index = tuple(slice(None) if m in component else 0 for m in range(len(player_map)))
+            jobs.append(([strategy_maps[n] for n in component], [player_map[n] for n in component], np.array([ce.utilities[n][index] for n in component]), mode))
+        solve, executor_type = solve_tensor_component, ProcessPoolExecutor
+    else:
+        jobs = [(ce, [player_map[n] for n in component], mode) for component in components]
+        # callables can't be sent to other processes
+        solve, executor_type = solve_callable_component, ThreadPoolExecutor
+    if max_workers == 1 or len(jobs) == 1:
+        results = [solve(*job) for job in jobs]
+    else:
+        with executor_type(max_workers=max_workers) as executor:
+            results = list(executor.map(solve, *zip(*jobs)))
+    return Product_distribution(player_map, strategy_maps, list(zip(components, results)), ce.debug)
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,123 @@
+# exports a solved correlated equilibrium as compact calldata for the on-chain CorrelatedPlanner
+#
+# probabilities are PRBMathSD59x18 fixed point values (probability * 10^18) that sum to exactly 10^18,
+# and each supported profile is packed as ceil(log2 S) bits per player
+from fractions import Fraction
+import numpy as np
+from typing import List, Dict, Tuple
+
+FIXED_POINT_ONE = 10 ** 18
+# 10^18 < 2^64, so every probability fits in 8 bytes of calldata
+PROBABILITY_BYTES = 8
+EXPORT_SIGNATURE = "set_correlated_equilibrium(uint8,uint16,bytes,bytes)"
+# the first 4 bytes of keccak256("set_correlated_equilibrium(uint8,uint16,bytes,bytes)")
+EXPORT_SELECTOR = bytes.fromhex("c77ea585")
+
+def quantize_probabilities(probabilities: np.ndarray) -> List[int]:
+    """
+    Quantizes probabilities to 59x18 fixed point with the largest remainder method, so the result sums to exactly 10^18.
+
+    Returns:
+    list: The fixed point probability of each entry.
+    """
+    exact = [Fraction(float(p)) for p in probabilities]
+    total = sum(exact)
+    scaled = [p * FIXED_POINT_ONE / total for p in exact]
+    quantized = [int(p) for p in scaled]
+    shortfall = FIXED_POINT_ONE - sum(quantized)
+    for index in sorted(range(len(scaled)), key=lambda i: scaled[i] - quantized[i], reverse=True)[:shortfall]:
+        quantized[index] += 1
+    return quantized
+
+def pack_profiles(profiles: np.ndarray, bits_per_strategy: int) -> bytes:
+    """
+    Packs profiles of strategy indices back to back, bits_per_strategy bits per player, most significant bit first.
+
+    Returns:
+    bytes: The packed profiles, zero padded to a whole byte.
+    """
+    shifts = np.arange(bits_per_strategy - 1, -1, -1)
+    bits = (np.asarray(profiles, dtype=np.int64)[..., None] >> shifts) & 1
+    return np.packbits(bits.astype(np.uint8).ravel()).tobytes()
+
+def unpack_profiles(data: bytes, num_players: int, bits_per_strategy: int, num_profiles: int) -> np.ndarray:
+    """
+    Returns:
+    np.ndarray: The (num_profiles, num_players) strategy indices packed by pack_profiles.
+    """
+    bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8))[:num_profiles * num_players * bits_per_strategy]
+    bits = bits.reshape(num_profiles, num_players, bits_per_strategy).astype(np.int64)
+    return (bits << np.arange(bits_per_strategy - 1, -1, -1)).sum(axis=2)
+
+def abi_encode_bytes(data: bytes) -> bytes:
+    """
+    Returns:
+    bytes: The ABI tail encoding of a dynamic bytes argument, its length followed by the zero padded data.
+    """
+    return len(data).to_bytes(32, "big") + data + b"\x00" * (-len(data) % 32)
+
+def export_distribution(probabilities: np.ndarray, threshold: float = 1e-12) -> Tuple[bytes, Dict]:
+    """
+    Prunes a distribution tensor over strategy profiles to its support and encodes it as calldata for
+    set_correlated_equilibrium(uint8 bitsPerStrategy, uint16 numPlayers, bytes probabilities, bytes profiles).
+
+    Returns:
+    tuple: The calldata and a report of its size, estimated calldata gas and quantization error.
+    """
+    probabilities = np.asarray(probabilities, dtype=float)
+    num_players = probabilities.ndim
+    num_strategies = max(probabilities.shape)
+    bits_per_strategy = max(1, int(num_strategies - 1).bit_length())
+    flat = probabilities.ravel()
+    support = np.flatnonzero(flat > threshold)
+    if len(support) == 0:
+        raise ValueError("Distribution has no probability mass above the threshold", threshold)
+    fixed_point = quantize_probabilities(flat[support])
+    profiles = np.stack(np.unravel_index(support, probabilities.shape), axis=1)
+
+    encoded_probabilities = b"".join(p.to_bytes(PROBABILITY_BYTES, "big") for p in fixed_point)
+    encoded_profiles = pack_profiles(profiles, bits_per_strategy)
+    head_size = 4 * 32
+    probabilities_tail = abi_encode_bytes(encoded_probabilities)
+    calldata = (EXPORT_SELECTOR
+                + bits_per_strategy.to_bytes(32, "big") + num_players.to_bytes(32, "big")
+                + head_size.to_bytes(32, "big") + (head_size + len(probabilities_tail)).to_bytes(32, "big")
+                + probabilities_tail + abi_encode_bytes(encoded_profiles))
+
+    total = flat[support].sum()
+    errors = np.abs(np.array(fixed_point, dtype=float) / FIXED_POINT_ONE - flat[support] / total)
+    zero_bytes = calldata.count(0)
+    report = {
+        "support_size": len(support),
+        "num_profiles": len(flat),
+        "bits_per_strategy": bits_per_strategy,
+        "pruned_mass": float(flat.sum() - total),
+        "max_quantization_error": float(errors.max()),
+        "calldata_bytes": len(calldata),
+        # calldata costs 4 gas per zero byte and 16 per nonzero byte
+        "calldata_gas": 4 * zero_bytes + 16 * (len(calldata) - zero_bytes),
+        # an int256[] of every profile probability, the dense alternative
+        "dense_calldata_bytes": 4 + 2 * 32 + 32 * len(flat),
+    }
+    return calldata, report
+
+def decode_calldata(calldata: bytes) -> Tuple[np.ndarray, List[int]]:
+    """
+    Decodes calldata produced by export_distribution.
+
+    Returns:
+    tuple: The (support_size, N) profiles and their fixed point probabilities.
+    """
+    if calldata[:4] != EXPORT_SELECTOR:
+        raise ValueError("Calldata is not a call to", EXPORT_SIGNATURE)
+    words = lambda start: int.from_bytes(calldata[4 + start:4 + start + 32], "big")
+    bits_per_strategy, num_players = words(0), words(32)
+    def read_bytes(offset: int) -> bytes:
+        length = words(offset)
+        return calldata[4 + offset + 32:4 + offset + 32 + length]
+    encoded_probabilities, encoded_profiles = read_bytes(words(64)), read_bytes(words(96))
+    fixed_point = [int.from_bytes(encoded_probabilities[i:i + PROBABILITY_BYTES], "big") for i in range(0, len(encoded_probabilities), PROBABILITY_BYTES)]
+    return unpack_profiles(encoded_profiles, num_players, bits_per_strategy, len(fixed_point)), fixed_point
+
+if __name__ == "__main__":
+    pass
@@ -3,6 +3,14 @@ from itertools import product
 import numpy as np
 import random
 from scipy.optimize import linprog
+from scipy.sparse import coo_matrix, csr_matrix
+from ce_pdhg import solve_ce_pdhg
+from ce_resolve import build_ic_pattern
+from ce_plan import DEFAULT_MEMORY_BUDGET, estimate_size, estimate_checks, choose_plan
+# zero-sum detection, the minimax LP, the best response scan and the game loaders are shared with the Nash solvers
+from normal_form.zero_sum import find_constant_sum, solve_zero_sum
+from normal_form.pure_equilibria import best_response_masks
+from normal_form.game_loader import load_game
 from typing import List, Dict, Callable, Union, Tuple
 
 class Correlated_equilibrium:
@@ -13,10 +21,53 @@ class Correlated_equilibrium:
         self.strategies: List[int] = [i for i in range(len(strategies))]
         self.player_map: List[str] = []
         self.players: List[int] = []
-        self.utilities = np.array([])
+        # each player's own strategy names, strategy_map unless others were given to add_player
+        self.player_strategy_maps: List[List[str]] = []
+        # utilities are kept per player and stacked once when first needed, so adding N players copies each one once
+        self.player_utilities: List[np.ndarray] = []
+        self.stacked_utilities: np.ndarray = None
         self.distribution: List[List[Union[float, List[int]]]] = None
+        self.solver_report: Dict = None
+        self.solver_plan: Dict = None
         self.debug = debug
 
+    @classmethod
+    def from_utilities(cls, strategies: List[str], players: List[str], utilities: np.ndarray, debug: bool = False,
+                       player_strategies: Union[List[List[str]], None] = None) -> "Correlated_equilibrium":
+        """
+        Creates a game from a whole (N, S_0, ..., S_N-1) utility tensor at once, without copying it.
+        player_strategies gives each player's own strategy names, every player uses strategies otherwise.
+        """
+        utilities = np.asarray(utilities, dtype=float)
+        player_strategies = [strategies for _ in players] if player_strategies is None else [list(names) for names in player_strategies]
+        if utilities.shape[1:] != tuple(len(names) for names in player_strategies):
+            raise ValueError("Utilities must have one axis per player of the size of their strategies", [len(names) for names in player_strategies])
+        ce = cls(strategies, debug)
+        ce.player_map = list(players)
+        ce.players = list(range(len(players)))
+        ce.player_strategy_maps = player_strategies
+        ce.player_utilities = list(utilities)
+        ce.stacked_utilities = utilities
+        return ce
+
+    @classmethod
+    def from_file(cls, path: str, debug: bool = False) -> "Correlated_equilibrium":
+        """
+        Loads a game from a Gambit .nfg or NumPy .npz file, keeping each player's own strategies.
+        """
+        game = load_game(path)
+        return cls.from_utilities(game["strategies"][0], game["players"], game["utilities"], debug, game["strategies"])
+
+    @property
+    def utilities(self) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The (N, S_0, ..., S_N-1) utility tensor, stacked from the players' utilities after the last add_player.
+        """
+        if self.stacked_utilities is None:
+            self.stacked_utilities = np.stack(self.player_utilities) if self.player_utilities else np.array([])
+        return self.stacked_utilities
+
     def get_lambdas(self) -> List[float]:
         """
         Returns:
@@ -35,11 +86,11 @@ class Correlated_equilibrium:
         list: A list of lists, where each list represents a combination of strategies with indices being players and values their strategy.
         """
         # Check if there are players and strategies
-        if not self.players or not self.strategies:
+        if not self.players or not all(self.player_strategy_maps):
             return []
 
-        # Create a list of strategies for each player
-        player_strategies = [self.strategies for _ in self.players]
+        # Create a list of strategies for each player, the profile space is mixed-radix when their counts differ
+        player_strategies = [self.get_strategies(player) for player in self.players]
         # Use itertools.product to generate all combinations
         combinations = list(product(*player_strategies))
         if self.debug:
@@ -52,7 +103,7 @@ class Correlated_equilibrium:
         list: A list of dicts, where each dict represents a combination of strategies with keys being players and values their strategy.
         """
         all_combinations = self.enumerate_strategy_combinations()
-        strategy_profiles = [{self.player_map[i]: self.strategy_map[strategy] for i, strategy in enumerate(combination)} for combination in all_combinations]
+        strategy_profiles = [self.map_list_to_profile(combination) for combination in all_combinations]
         if self.debug:
             print("\nAll strategy profiles:", strategy_profiles)
         return strategy_profiles
@@ -61,7 +112,14 @@ class Correlated_equilibrium:
         """
         Maps a list of strategies to a profile.
         """
-        return {self.player_map[i]: self.strategy_map[strategy] for i, strategy in enumerate(profile_list)}
+        return {self.player_map[i]: self.player_strategy_maps[i][strategy] for i, strategy in enumerate(profile_list)}
+
+    def get_strategies(self, player: int) -> List[int]:
+        """
+        Returns:
+        list: The indices of the player's own strategies.
+        """
+        return list(range(len(self.player_strategy_maps[player])))
     
     def map_dist_to_profiles(self, dist) -> List[Dict[str, str]]:
         """
@@ -76,15 +134,17 @@ class Correlated_equilibrium:
         Returns:
         tuple: A tuple containing the inequality constraint matrix (A_ub) and the inequality constraint vector (b_ub).
         """
-        num_constraints = len(self.players) * len(self.strategies) * (len(self.strategies) - 1)
+        # rows only exist for the (strategy, alternate) pairs of each player's own strategies
+        num_constraints = sum(len(self.get_strategies(player)) * (len(self.get_strategies(player)) - 1) for player in self.players)
         num_variables = len(self.distribution)
         A_ub = np.zeros((num_constraints, num_variables))
         b_ub = np.zeros(num_constraints)
-        return A_ub, b_ub
         constraint_index = 0
         for player in self.players:
-            for strategy in self.strategies:
-                for alternate_strategy in self.strategies:
+            player_utilities = self.utilities[player]
+            for strategy in self.get_strategies(player):
+                signaled_utilities = np.take(player_utilities, strategy, axis=player)
+                for alternate_strategy in self.get_strategies(player):
                     # each row in the A_ub matrix corresponds to a constraint for a given player to play a given strategy vs an alternate strategy, 
                     # where there is an entry for each strategy profile. the value of any index of the row is non-zero iff in the profile you are signaled to 
                     # play the given strategy, and the value is the difference in utility between the alternate strategy and the signaled strategy
@@ -92,12 +152,11 @@ class Correlated_equilibrium:
                     # If a row times the probability distribution vector is positive, it means that deviation given that strategy is a utility benefit, 
                     # so we constrain it to be less than or equal to 0
                     if strategy != alternate_strategy:
-                        for index, dist_entry in enumerate(self.distribution):
-                            profile = dist_entry["strategy"]
-                            if profile[player] == strategy:
-                                player_utility = self.utilities[player](profile)
-                                deviation_utility = self.utilities[player]({**profile, player: alternate_strategy})
-                                A_ub[constraint_index][index] = deviation_utility - player_utility
+                        row = np.zeros(player_utilities.shape)
+                        signaled_slice = [slice(None)] * row.ndim
+                        signaled_slice[player] = strategy
+                        row[tuple(signaled_slice)] = np.take(player_utilities, alternate_strategy, axis=player) - signaled_utilities
+                        A_ub[constraint_index] = row.ravel()
                         constraint_index += 1
         if self.debug:
             print("\nA_ub:\n", [",".join([str(round(x, 3)) for x in row]) + "\n" for row in A_ub])
@@ -105,6 +164,87 @@ class Correlated_equilibrium:
         return A_ub, b_ub
         
     
+    def build_cce_constraints(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Builds the coarse correlated equilibrium constraints for the linear program directly from the utility tensor.
+        
+        Returns:
+        tuple: A tuple containing the inequality constraint matrix (A_ub) and the inequality constraint vector (b_ub).
+        """
+        num_constraints = sum(len(self.get_strategies(player)) for player in self.players)
+        num_variables = len(self.distribution)
+        A_ub = np.zeros((num_constraints, num_variables))
+        b_ub = np.zeros(num_constraints)
+        constraint_index = 0
+        for player in self.players:
+            player_utilities = self.utilities[player]
+            for alternate_strategy in self.get_strategies(player):
+                # utility of committing to the alternate strategy, broadcast back over the player's own axis
+                deviation_utilities = np.take(player_utilities, [alternate_strategy], axis=player)
+                A_ub[constraint_index] = (deviation_utilities - player_utilities).ravel()
+                constraint_index += 1
+        if self.debug:
+            print("\nA_ub:\n", [",".join([str(round(x, 3)) for x in row]) + "\n" for row in A_ub])
+            print("\nb_ub:\n", b_ub)
+        return A_ub, b_ub
+
+    def build_sparse_constraints(self, mode: str = "ce") -> Tuple[csr_matrix, np.ndarray]:
+        """
+        Builds the same constraints as build_ic_constraints (mode "ce") or build_cce_constraints (mode "cce") as a sparse
+        matrix, gathering only the structural nonzeros from the utility tensor.
+
+        Returns:
+        tuple: A tuple containing the sparse inequality constraint matrix (A_ub) and the inequality constraint vector (b_ub).
+        """
+        pattern = build_ic_pattern(self.utilities.shape[1:], mode)
+        flat = self.utilities.reshape(len(self.players), -1)
+        coefficients = flat[pattern["players"], pattern["deviations"]] - flat[pattern["players"], pattern["cols"]]
+        A_ub = coo_matrix((coefficients, (pattern["rows"], pattern["cols"])), shape=(pattern["num_rows"], flat.shape[1])).tocsr()
+        b_ub = np.zeros(pattern["num_rows"])
+        if self.debug:
+            print("\nSparse A_ub:", A_ub.shape, "with", A_ub.nnz, "nonzeros")
+        return A_ub, b_ub
+
+    def find_optimal_pure_equilibrium(self) -> Union[Tuple[int, ...], None]:
+        """
+        Scans every player's best responses for a pure Nash equilibrium that also maximizes the weighted welfare over all
+        profiles. No CE or CCE can do better than the best profile, so such an equilibrium is an optimal distribution on its own.
+
+        Returns:
+        tuple: The strategy indices of the equilibrium, or None if there is none.
+        """
+        welfare = np.tensordot(np.asarray(self.get_lambdas(), dtype=float), self.utilities, axes=1)
+        optimal = welfare >= np.max(welfare) - 1e-9 * max(1, np.max(np.abs(welfare)))
+        equilibria = np.argwhere(optimal & np.all(best_response_masks(self.utilities), axis=0))
+        return tuple(int(strategy) for strategy in equilibria[0]) if len(equilibria) else None
+
+    def plan_distribution(self, mode: str = "ce", memory_budget: Union[int, None] = None, time_budget: Union[float, None] = None) -> Dict:
+        """
+        Estimates the size of the LP and picks the cheapest solver path that fits the budgets, without building the LP.
+        The pure equilibrium and constant-sum checks that can unlock the "pure" and "minimax" paths allocate arrays of size
+        S^N, so they only run when ce_plan.estimate_checks fits the memory budget; otherwise nothing of size S^N is allocated.
+
+        Parameters:
+        mode (str): "ce" or "cce".
+        memory_budget (int): the peak bytes allowed, defaults to ce_plan.DEFAULT_MEMORY_BUDGET.
+        time_budget (float): the seconds allowed, unlimited by default.
+
+        Returns:
+        dict: The plan from ce_plan.choose_plan, with the chosen method under "method" and whether the checks ran under "checked".
+        """
+        shape = tuple(len(strategies) for strategies in self.player_strategy_maps)
+        methods = ("highs", "sparse", "pdhg")
+        checked = estimate_checks(estimate_size(shape, mode)) <= (DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget)
+        if checked and self.find_optimal_pure_equilibrium() is not None:
+            methods = ("pure",) + methods
+        elif checked and len(self.players) == 2 and find_constant_sum(self.utilities) is not None:
+            methods = ("minimax",) + methods
+        plan = choose_plan(shape, mode, True, methods, memory_budget, time_budget)
+        plan["checked"] = checked
+        if self.debug:
+            print("\nSolver plan:\n", plan)
+        return plan
+
     def initialize_distribution(self):
         """
         Initializes the distribution with equal probability for each strategy combination.
@@ -115,14 +255,65 @@ class Correlated_equilibrium:
         if self.debug:
             print("\nDistribuiton initialized:\n", "\n".join([str(row) for row in self.distribution]))
 
-    def optimize_distribution(self):
+    def optimize_distribution(self, mode: str = "ce", method: str = "highs", tolerance: float = 1e-6,
+                              memory_budget: Union[int, None] = None, time_budget: Union[float, None] = None):
         """
         Optimizes the distribution using linear programming.
+
+        Parameters:
+        mode (str): "ce" for a correlated equilibrium, "cce" for a coarse correlated equilibrium.
+        method (str): "highs" to build a dense A_ub and call linprog, "sparse" to call linprog with a sparse A_ub,
+            "pdhg" for the matrix-free first-order solver, which warm starts from the current distribution and the
+            previous dual solution, "minimax" for 2 player constant-sum games, where the product of the players' minimax
+            strategies is optimal for any objective, "pure" when a pure Nash equilibrium maximizes welfare over all profiles,
+            or "auto" to pick one with plan_distribution. The plan is kept in solver_plan and every method sets solver_report.
+        tolerance (float): relative termination tolerance for the "pdhg" method.
+        memory_budget (int): the peak bytes allowed for the "auto" method.
+        time_budget (float): the seconds allowed for the "auto" method.
         """
+        if mode not in ("ce", "cce"):
+            raise ValueError("Unknown equilibrium mode", mode)
+        if method not in ("highs", "sparse", "pdhg", "minimax", "pure", "auto"):
+            raise ValueError("Unknown optimization method", method)
+        if method == "auto":
+            self.solver_plan = self.plan_distribution(mode, memory_budget, time_budget)
+            method = self.solver_plan["method"]
         # create a linear program
         if not self.distribution:
             self.initialize_distribution()
         lambdas = self.get_lambdas()
+        if method == "pdhg":
+            initial_distribution = np.array([dist_entry[0] for dist_entry in self.distribution])
+            initial_dual = self.solver_report.get("dual") if self.solver_report and self.solver_report["mode"] == mode else None
+            x, self.solver_report = solve_ce_pdhg(self.utilities, lambdas, mode, tolerance, initial_distribution=initial_distribution,
+                                                  initial_dual=initial_dual, debug=self.debug)
+            self.distribution = [[probability, dist_entry[1]] for probability, dist_entry in zip(x.ravel(), self.distribution)]
+            return self.map_dist_to_profiles(self.distribution)
+        if method == "pure":
+            equilibrium = self.find_optimal_pure_equilibrium()
+            if equilibrium is None:
+                raise ValueError("No pure Nash equilibrium maximizes welfare")
+            self.solver_report = {"status": "optimal", "mode": mode, "equilibrium": equilibrium}
+            self.distribution = [[1.0 if tuple(dist_entry[1]) == equilibrium else 0.0, dist_entry[1]] for dist_entry in self.distribution]
+            return self.map_dist_to_profiles(self.distribution)
+        if method == "minimax":
+            result = solve_zero_sum(self.utilities)
+            if result is None:
+                raise ValueError("Minimax method needs a 2 player constant-sum game")
+            # every CE and CCE of a constant-sum game pays each player their value, so the objective is flat over them
+            x = np.outer(result["x"][0], result["x"][1])
+            self.solver_report = {"status": "optimal", "mode": mode, "values": result["values"], "exploitability": result["exploitability"]}
+            self.distribution = [[probability, dist_entry[1]] for probability, dist_entry in zip(x.ravel(), self.distribution)]
+            return self.map_dist_to_profiles(self.distribution)
+        if method == "sparse":
+            c = -(np.asarray(lambdas, dtype=float) @ self.utilities.reshape(len(self.players), -1))
+            A_ub, b_ub = self.build_sparse_constraints(mode)
+            res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=np.ones((1, len(c))), b_eq=np.array([1]), method='highs')
+            if res.x is None:
+                raise ValueError("Linear programming failed to find a solution", res.message)
+            self.solver_report = {"status": "optimal", "mode": mode, "iterations": res.nit}
+            self.distribution = [[res.x[i], dist_entry[1]] for i, dist_entry in enumerate(self.distribution)]
+            return self.map_dist_to_profiles(self.distribution)
         outcome_utility_sums = []
         for dist_entry in self.distribution:
             profile = dist_entry[1]
@@ -138,10 +329,11 @@ class Correlated_equilibrium:
         b_eq = np.array([1])
 
         # build IC constraints
-        A_ub, b_ub = self.build_ic_constraints()
+        A_ub, b_ub = self.build_ic_constraints() if mode == "ce" else self.build_cce_constraints()
         if self.debug:
             print("\n DIMENSIONS:\n", "A_ub:", np.shape(A_ub), "b_ub:", np.shape(b_ub), "A_eq:", np.shape(A_eq), "b_eq:", np.shape(b_eq))
         res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, method='highs')
+        self.solver_report = {"status": "optimal" if res.success else res.message, "mode": mode, "iterations": res.nit}
         if self.debug:
             print("\nResult of optimization:\n", "\n".join([str(round(res.x[i], 3)) + " " + str(self.map_list_to_profile(self.distribution[i][1])) for i in range(len(res.x))]))
         self.distribution = [[res.x[i], self.distribution[i][1]] for i in range(len(self.distribution))]
@@ -169,17 +361,27 @@ class Correlated_equilibrium:
         print("WARNING: Rounding errors in sampling distribution, sum of probabilities is less than 1. Returning last strategy.")
         return self.map_list_to_profile(self.distribution[-1][1])
 
-    def add_player(self, player: str, utility: List):
+    def add_player(self, player: str, utility: List, strategies: Union[List[str], None] = None):
         """
-        Adds a player to the game with their utility function. Assumes strategies are the same for each player.
+        Adds a player to the game with their utility function, a tensor with one axis per player of the size of that player's strategies.
+
+        Parameters:
+        strategies (list): the player's own strategy names, the strategies the game was created with by default.
         """
+        strategies = self.strategy_map if strategies is None else strategies
+        utility = np.array(utility)
+        if self.player_utilities and utility.shape != self.player_utilities[0].shape:
+            raise ValueError("Utility must have the same shape as the other players'", self.player_utilities[0].shape)
+        if utility.ndim <= len(self.players) or utility.shape[len(self.players)] != len(strategies):
+            raise ValueError("Utility must have an axis of size", len(strategies), "for the player's strategies")
         self.player_map.append(player)
         self.players.append(len(self.players))
-        if(self.utilities.size == 0):
-            self.utilities = np.array([utility])
-        else:
-            self.utilities = np.concatenate((self.utilities, np.array([utility])))
+        self.player_strategy_maps.append(strategies)
+        self.player_utilities.append(utility)
+        self.stacked_utilities = None
         self.distribution = None
+        self.solver_report = None
+        self.solver_plan = None
 
 if __name__ == "__main__":
     pass
\ No newline at end of file
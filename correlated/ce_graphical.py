@@ -0,0 +1,270 @@
+# python implementation of correlated equilibrium for graphical games, following Kakade et al. (2003)
+# each player's utility depends only on their own strategy and their neighbors' strategies, so the LP is written over
+# local marginals on the bags of a junction tree instead of the full S^N profile space
+import numpy as np
+import random
+from scipy.optimize import linprog
+from scipy.sparse import coo_matrix, vstack
+from typing import List, Dict, Tuple
+
+class Graphical_game:
+    debug: bool = False
+
+    def __init__(self, strategies: List[str], debug: bool = False):
+        self.strategy_map: List[str] = strategies
+        self.strategies: List[int] = [i for i in range(len(strategies))]
+        self.player_map: List[str] = []
+        self.players: List[int] = []
+        self.neighbor_map: List[List[str]] = []
+        self.neighbors: List[List[int]] = None
+        self.utilities: List[np.ndarray] = []
+        self.bags: List[List[int]] = None
+        self.parents: List[int] = None
+        self.marginals: List[np.ndarray] = None
+        self.debug = debug
+
+    def add_player(self, player: str, neighbors: List[str], utility):
+        """
+        Adds a player to the game with their local payoff table. Neighbors may be added later.
+        The table has one axis for the player followed by one axis per neighbor, in the order given.
+        """
+        utility = np.asarray(utility, dtype=float)
+        if utility.shape != (len(self.strategies),) * (1 + len(neighbors)):
+            raise ValueError("Local utility table must have one axis of size", len(self.strategies), "for the player and each neighbor")
+        self.player_map.append(player)
+        self.players.append(len(self.players))
+        self.neighbor_map.append(neighbors)
+        self.utilities.append(utility)
+        self.bags = None
+        self.marginals = None
+
+    def get_lambdas(self) -> List[float]:
+        """
+        Returns:
+        list: A list of lambda weights for each player to be optimized over.
+        """
+        lambdas = [1 for _ in self.players]
+        if self.debug:
+            print("\nInitial lambdas:\n", lambdas)
+        return lambdas
+
+    def get_neighborhood(self, player: int) -> List[int]:
+        """
+        Returns:
+        list: The player followed by their neighbors, the axes of the player's local utility table.
+        """
+        return [player] + self.neighbors[player]
+
+    def build_junction_tree(self):
+        """
+        Builds a junction tree whose bags cover every player's neighborhood by greedy min-fill elimination
+        on the interaction graph. The LP size is exponential only in the largest bag, i.e. the treewidth.
+        """
+        self.neighbors = [[self.player_map.index(neighbor) for neighbor in neighbors] for neighbors in self.neighbor_map]
+        adjacency = {player: set() for player in self.players}
+        for player in self.players:
+            neighborhood = self.get_neighborhood(player)
+            for a in neighborhood:
+                adjacency[a].update(b for b in neighborhood if b != a)
+
+        remaining = set(self.players)
+        elimination_order = []
+        elimination_cliques = {}
+        while remaining:
+            def fill_in(v: int) -> int:
+                neighbors = list(adjacency[v] & remaining)
+                return sum(1 for i, a in enumerate(neighbors) for b in neighbors[i + 1:] if b not in adjacency[a])
+            v = min(sorted(remaining), key=lambda v: (fill_in(v), len(adjacency[v] & remaining)))
+            neighbors = adjacency[v] & remaining
+            for a in neighbors:
+                adjacency[a].update(b for b in neighbors if b != a)
+            elimination_cliques[v] = sorted(neighbors | {v})
+            elimination_order.append(v)
+            remaining.remove(v)
+
+        # each elimination clique hangs off the clique of its earliest eliminated remaining neighbor
+        position = {v: index for index, v in enumerate(elimination_order)}
+        bags = [elimination_cliques[v] for v in elimination_order]
+        parents = []
+        for v in elimination_order:
+            separator = [u for u in elimination_cliques[v] if u != v]
+            parents.append(min(position[u] for u in separator) if separator else -1)
+        # merge every bag contained in an adjacent bag into it, re-pointing the children, so no marginal is solved for twice
+        merged = True
+        while merged:
+            merged = False
+            for index in range(len(bags)):
+                parent = parents[index]
+                if parent is None or parent < 0:
+                    continue
+                if set(bags[index]) <= set(bags[parent]):
+                    removed, survivor = index, parent
+                elif set(bags[parent]) <= set(bags[index]):
+                    removed, survivor = parent, index
+                    parents[index] = parents[parent]
+                else:
+                    continue
+                parents = [survivor if p == removed and i != survivor else p for i, p in enumerate(parents)]
+                parents[removed] = None
+                merged = True
+        kept = [index for index in range(len(bags)) if parents[index] is not None]
+        new_index = {index: position for position, index in enumerate(kept)}
+        self.bags = [bags[index] for index in kept]
+        self.parents = [new_index[parents[index]] if parents[index] >= 0 else -1 for index in kept]
+        if self.debug:
+            print("\nJunction tree bags:", self.bags, "\nParents:", self.parents)
+
+    def get_sampling_order(self) -> List[int]:
+        """
+        Returns:
+        list: The bag indices from the roots down, so every bag comes after its parent. Merging bags can leave a
+            parent before its child in elimination order, so the order is walked from the parents instead.
+        """
+        order = [index for index, parent in enumerate(self.parents) if parent < 0]
+        position = 0
+        while position < len(order):
+            order.extend(child for child, parent in enumerate(self.parents) if parent == order[position])
+            position += 1
+        return order
+
+    def get_player_bags(self) -> List[int]:
+        """
+        Returns:
+        list: For each player, the index of a bag containing their whole neighborhood.
+        """
+        return [next(index for index, bag in enumerate(self.bags) if set(self.get_neighborhood(player)) <= set(bag)) for player in self.players]
+
+    def expand_utility(self, player: int, bag: List[int]) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The player's local utility table broadcast over the strategies of every member of the bag.
+        """
+        neighborhood = self.get_neighborhood(player)
+        table = np.transpose(self.utilities[player], np.argsort([bag.index(member) for member in neighborhood]))
+        table = table.reshape([len(self.strategies) if member in neighborhood else 1 for member in bag])
+        return np.broadcast_to(table, (len(self.strategies),) * len(bag))
+
+    def build_local_lp(self) -> Tuple:
+        """
+        Builds the LP over bag marginals: bag sums, separator consistency and IC constraints.
+
+        Returns:
+        tuple: c, A_ub, b_ub, A_eq, b_eq and the variable offset of each bag.
+        """
+        num_strategies = len(self.strategies)
+        sizes = [num_strategies ** len(bag) for bag in self.bags]
+        offsets = np.concatenate(([0], np.cumsum(sizes))).astype(int)
+        num_variables = int(offsets[-1])
+
+        # every bag marginal sums to 1, and agrees with its parent on their separator
+        eq_blocks = [coo_matrix((np.ones(num_variables), (np.searchsorted(offsets, np.arange(num_variables), side="right") - 1, np.arange(num_variables))),
+                                shape=(len(self.bags), num_variables))]
+        for index, bag in enumerate(self.bags):
+            parent = self.parents[index]
+            if parent < 0:
+                continue
+            separator = [member for member in bag if member in self.bags[parent]]
+            rows, cols, values = [], [], []
+            for bag_index, sign in [(index, 1), (parent, -1)]:
+                members = self.bags[bag_index]
+                assignments = np.indices((num_strategies,) * len(members)).reshape(len(members), -1)
+                separator_rows = np.ravel_multi_index([assignments[members.index(member)] for member in separator], (num_strategies,) * len(separator)) if separator else np.zeros(assignments.shape[1], dtype=int)
+                rows.append(separator_rows)
+                cols.append(offsets[bag_index] + np.arange(assignments.shape[1]))
+                values.append(np.full(assignments.shape[1], sign))
+            eq_blocks.append(coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                                        shape=(num_strategies ** len(separator), num_variables)))
+        A_eq = vstack(eq_blocks).tocsr()
+        b_eq = np.zeros(A_eq.shape[0])
+        b_eq[:len(self.bags)] = 1
+
+        # IC constraints and welfare only involve the bag holding each player's neighborhood
+        lambdas = self.get_lambdas()
+        c = np.zeros(num_variables)
+        rows, cols, values = [], [], []
+        constraint_index = 0
+        for player, bag_index in zip(self.players, self.get_player_bags()):
+            bag = self.bags[bag_index]
+            axis = bag.index(player)
+            bag_utilities = self.expand_utility(player, bag)
+            c[offsets[bag_index]:offsets[bag_index + 1]] -= lambdas[player] * bag_utilities.ravel()
+            for strategy in self.strategies:
+                signaled_utilities = np.take(bag_utilities, [strategy], axis=axis)
+                signaled_columns = np.take(np.arange(sizes[bag_index]).reshape(bag_utilities.shape), [strategy], axis=axis).ravel()
+                for alternate_strategy in self.strategies:
+                    if strategy != alternate_strategy:
+                        deviation = (np.take(bag_utilities, [alternate_strategy], axis=axis) - signaled_utilities).ravel()
+                        rows.append(np.full(len(deviation), constraint_index))
+                        cols.append(offsets[bag_index] + signaled_columns)
+                        values.append(deviation)
+                        constraint_index += 1
+        A_ub = coo_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))), shape=(constraint_index, num_variables)).tocsr()
+        b_ub = np.zeros(constraint_index)
+        if self.debug:
+            print("\n DIMENSIONS:\n", "A_ub:", A_ub.shape, "A_eq:", A_eq.shape, "variables:", num_variables)
+        return c, A_ub, b_ub, A_eq, b_eq, offsets
+
+    def optimize_distribution(self) -> List[Dict]:
+        """
+        Optimizes the bag marginals using linear programming.
+
+        Returns:
+        list: A list of dicts with the players of each bag and their joint marginal as a tensor.
+        """
+        if self.bags is None:
+            self.build_junction_tree()
+        c, A_ub, b_ub, A_eq, b_eq, offsets = self.build_local_lp()
+        # the interior point method handles the many redundant consistency rows far better than dual simplex
+        res = linprog(c, A_ub=A_ub, b_ub=b_ub, A_eq=A_eq, b_eq=b_eq, bounds=(0, None), method='highs-ipm')
+        if not res.success:
+            raise ValueError("Linear programming failed to find a solution", str(res.status))
+        self.marginals = [np.maximum(res.x[offsets[i]:offsets[i + 1]], 0).reshape((len(self.strategies),) * len(bag)) for i, bag in enumerate(self.bags)]
+        if self.debug:
+            print("\nExpected welfare:", -res.fun)
+        return [{"players": [self.player_map[member] for member in bag], "marginal": marginal} for bag, marginal in zip(self.bags, self.marginals)]
+
+    def get_neighborhood_marginal(self, player: int) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The joint marginal over the player's neighborhood, with axes ordered as in their utility table.
+        """
+        if self.marginals is None:
+            self.optimize_distribution()
+        bag_index = self.get_player_bags()[player]
+        bag = self.bags[bag_index]
+        neighborhood = self.get_neighborhood(player)
+        marginal = self.marginals[bag_index].sum(axis=tuple(axis for axis, member in enumerate(bag) if member not in neighborhood))
+        kept = [member for member in bag if member in neighborhood]
+        return np.transpose(marginal, [kept.index(member) for member in neighborhood])
+
+    def sample_distribution(self) -> Dict[str, str]:
+        """
+        Samples a joint recommendation by drawing each bag conditioned on its separator, from the roots down.
+
+        Returns:
+        dict: A dictionary of {player: strategy} representing the sampled strategy.
+        """
+        if self.marginals is None:
+            self.optimize_distribution()
+        assignment = {}
+        # by the running intersection property a bag only shares its separator with the bags before it in this order
+        for index in self.get_sampling_order():
+            bag = self.bags[index]
+            conditional = self.marginals[index]
+            for axis in reversed(range(len(bag))):
+                if bag[axis] in assignment:
+                    conditional = np.take(conditional, assignment[bag[axis]], axis=axis)
+            free = [member for member in bag if member not in assignment]
+            if not free:
+                continue
+            weights = conditional.ravel()
+            flat_index = random.choices(range(len(weights)), weights=weights)[0]
+            for member, strategy in zip(free, np.unravel_index(flat_index, conditional.shape)):
+                assignment[member] = int(strategy)
+        sample = {self.player_map[player]: self.strategy_map[assignment[player]] for player in self.players}
+        if self.debug:
+            print("\nSampled strategy:", sample)
+        return sample
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,237 @@
+# matrix-free primal-dual hybrid gradient (PDHG) solver for the correlated equilibrium linear program
+import numpy as np
+from typing import List, Dict, Tuple, Union
+
+class Ic_operator:
+    """
+    Applies the IC constraint matrix of a ce_fast utility tensor, and its transpose, without materializing A_ub.
+
+    Rows are ordered exactly as in ce_fast's build_ic_constraints (mode "ce") or build_cce_constraints (mode "cce"),
+    and columns are the C-ordered strategy profiles, so matvec(x) == A_ub @ x.ravel().
+    """
+    def __init__(self, utilities: np.ndarray, mode: str = "ce"):
+        if mode not in ("ce", "cce"):
+            raise ValueError("Unknown equilibrium mode", mode)
+        self.utilities = np.asarray(utilities, dtype=float)
+        self.mode = mode
+        self.num_players = self.utilities.shape[0]
+        self.shape = self.utilities.shape[1:]
+        # each player's utilities with their own strategy axis first, flattened over the other players' strategies
+        self.player_utilities = [np.moveaxis(self.utilities[n], n, 0).reshape(self.shape[n], -1) for n in range(self.num_players)]
+        self.off_diagonal = [~np.eye(num_strategies, dtype=bool) for num_strategies in self.shape]
+        row_counts = [num_strategies * (num_strategies - 1) if mode == "ce" else num_strategies for num_strategies in self.shape]
+        self.row_offsets = np.concatenate(([0], np.cumsum(row_counts))).astype(int)
+        self.num_rows = int(self.row_offsets[-1])
+
+    def matvec(self, x: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: A_ub @ x for a distribution x given as a tensor over strategy profiles.
+        """
+        Ax = np.empty(self.num_rows)
+        for n in range(self.num_players):
+            signaled = np.moveaxis(x, n, 0).reshape(self.shape[n], -1)
+            # G[s][t] is the expected utility of playing t over the profiles where n is signaled s
+            G = signaled @ self.player_utilities[n].T
+            if self.mode == "ce":
+                rows = (G - np.diag(G)[:, None])[self.off_diagonal[n]]
+            else:
+                rows = G.sum(axis=0) - np.trace(G)
+            Ax[self.row_offsets[n]:self.row_offsets[n + 1]] = rows
+        return Ax
+
+    def rmatvec(self, y: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: A_ub.T @ y reshaped to a tensor over strategy profiles.
+        """
+        ATy = np.zeros(self.shape)
+        for n in range(self.num_players):
+            num_strategies = self.shape[n]
+            player_y = y[self.row_offsets[n]:self.row_offsets[n + 1]]
+            if self.mode == "ce":
+                Y = np.zeros((num_strategies, num_strategies))
+                Y[self.off_diagonal[n]] = player_y
+            else:
+                # committing to t ahead of time is the same row for every signaled strategy s
+                Y = np.tile(player_y, (num_strategies, 1))
+            utilities = self.player_utilities[n]
+            contribution = Y @ utilities - Y.sum(axis=1)[:, None] * utilities
+            other_shape = tuple(d for k, d in enumerate(self.shape) if k != n)
+            ATy += np.moveaxis(contribution.reshape((num_strategies,) + other_shape), 0, n)
+        return ATy
+
+    def estimate_norm(self, iterations: int = 50, seed: int = 0) -> float:
+        """
+        Estimates the spectral norm of [A_ub; 1^T] by power iteration.
+        """
+        rng = np.random.default_rng(seed)
+        v = rng.random(self.shape)
+        norm = 0.0
+        for _ in range(iterations):
+            v /= np.linalg.norm(v)
+            w = self.rmatvec(self.matvec(v)) + v.sum()
+            norm = np.sqrt(np.linalg.norm(w))
+            v = w
+        return norm
+
+def _kkt_error(operator: Ic_operator, c: np.ndarray, x: np.ndarray, y: np.ndarray, z: float, Ax: np.ndarray, ATy: np.ndarray) -> Dict[str, float]:
+    """
+    Returns:
+    dict: The primal residual, dual residual and duality gap of an iterate, and their combined norm.
+    """
+    primal_residual = np.sqrt(np.sum(np.maximum(Ax, 0) ** 2) + (x.sum() - 1) ** 2)
+    reduced_costs = c + ATy + z
+    dual_residual = np.linalg.norm(np.minimum(reduced_costs, 0))
+    primal_objective = np.sum(c * x)
+    dual_objective = -z
+    gap = abs(primal_objective - dual_objective)
+    return {
+        "primal_residual": primal_residual,
+        "dual_residual": dual_residual,
+        "gap": gap,
+        "primal_objective": primal_objective,
+        "dual_objective": dual_objective,
+        "kkt": np.sqrt(primal_residual ** 2 + dual_residual ** 2 + gap ** 2),
+    }
+
+def _converged(errors: Dict[str, float], tolerance: float, c_norm: float) -> bool:
+    """
+    Returns:
+    bool: True iff the relative primal residual, dual residual and duality gap are all within tolerance.
+    """
+    return (errors["primal_residual"] <= tolerance * 2 and errors["dual_residual"] <= tolerance * (1 + c_norm)
+            and errors["gap"] <= tolerance * (1 + abs(errors["primal_objective"]) + abs(errors["dual_objective"])))
+
+def solve_ce_pdhg(utilities: np.ndarray, lambdas: Union[List[float], None] = None, mode: str = "ce", tolerance: float = 1e-6,
+                  max_iterations: int = 100000, initial_distribution: Union[np.ndarray, None] = None,
+                  initial_dual: Union[Tuple[np.ndarray, float], None] = None, check_frequency: int = 64,
+                  debug: bool = False) -> Tuple[np.ndarray, Dict]:
+    """
+    Solves max sum_n lambda_n E[u_n] over (coarse) correlated equilibria with restarted, adaptive-step PDHG.
+    Every product with the constraint matrix is an axis-wise contraction of the utility tensor, so memory stays O(N * S^N).
+
+    Parameters:
+    utilities (np.ndarray): the (N, S, ..., S) ce_fast utility tensor.
+    lambdas (list): welfare weight for each player, defaults to 1 for every player.
+    mode (str): "ce" or "cce".
+    tolerance (float): relative tolerance on the primal residual, dual residual and duality gap.
+    initial_distribution (np.ndarray): a previous distribution over profiles to warm start from.
+    initial_dual (tuple): the (y, z) dual pair from a previous report to warm start from.
+
+    Returns:
+    tuple: The distribution as a tensor over strategy profiles and a report dict describing the solve.
+    """
+    operator = Ic_operator(utilities, mode)
+    if lambdas is None:
+        lambdas = [1 for _ in range(operator.num_players)]
+    c = -np.tensordot(np.asarray(lambdas, dtype=float), operator.utilities, axes=1)
+    c_norm = np.linalg.norm(c)
+
+    if initial_distribution is None:
+        x = np.full(operator.shape, 1 / np.prod(operator.shape))
+    else:
+        x = np.maximum(np.asarray(initial_distribution, dtype=float).reshape(operator.shape), 0)
+    if initial_dual is None:
+        y, z = np.zeros(operator.num_rows), 0.0
+    else:
+        y, z = np.maximum(np.asarray(initial_dual[0], dtype=float), 0), float(initial_dual[1])
+
+    step_size = 1 / max(operator.estimate_norm(), 1e-12)
+    primal_weight = c_norm if c_norm > 1e-12 else 1.0
+
+    Ax, ATy = operator.matvec(x), operator.rmatvec(y)
+    restart_x, restart_y, restart_z = x.copy(), y.copy(), z
+    initial_errors = _kkt_error(operator, c, x, y, z, Ax, ATy)
+    restart_kkt = initial_errors["kkt"]
+    previous_candidate_kkt = np.inf
+    sum_x, sum_y, sum_z, sum_weight = np.zeros_like(x), np.zeros_like(y), 0.0, 0.0
+    inner_iterations, restarts = 0, 0
+    status, errors = "iteration_limit", None
+    # a warm start may already be optimal for the current utilities
+    if _converged(initial_errors, tolerance, c_norm):
+        status, errors, max_iterations = "optimal", initial_errors, 0
+
+    iteration = 0
+    while iteration < max_iterations:
+        iteration += 1
+        inner_iterations += 1
+        # adaptive step size: shrink until the step satisfies the local Lipschitz bound
+        while True:
+            tau, sigma = step_size / primal_weight, step_size * primal_weight
+            next_x = np.maximum(x - tau * (c + ATy + z), 0)
+            next_Ax = operator.matvec(next_x)
+            extrapolated_Ax = 2 * next_Ax - Ax
+            next_y = np.maximum(y + sigma * extrapolated_Ax, 0)
+            next_z = z + sigma * (2 * next_x.sum() - x.sum() - 1)
+            dx, dy, dz = next_x - x, next_y - y, next_z - z
+            interaction = abs(np.dot(dy, next_Ax - Ax) + dz * dx.sum())
+            movement = primal_weight * np.sum(dx ** 2) + (np.sum(dy ** 2) + dz ** 2) / primal_weight
+            max_step = movement / (2 * interaction) if interaction > 0 else np.inf
+            accepted = step_size <= max_step
+            step_size = min((1 - (iteration + 1) ** -0.3) * max_step, (1 + (iteration + 1) ** -0.6) * step_size)
+            if accepted:
+                break
+        x, y, z, Ax = next_x, next_y, next_z, next_Ax
+        ATy = operator.rmatvec(y)
+        weight = tau * primal_weight
+        sum_x += weight * x
+        sum_y += weight * y
+        sum_z += weight * z
+        sum_weight += weight
+
+        if iteration % check_frequency != 0 and iteration != max_iterations:
+            continue
+        current = _kkt_error(operator, c, x, y, z, Ax, ATy)
+        if debug:
+            print("\nPDHG iteration", iteration, "kkt", current["kkt"], "step size", step_size, "primal weight", primal_weight)
+        if _converged(current, tolerance, c_norm):
+            status, errors = "optimal", current
+            break
+
+        # restart from whichever of the current and average iterates has the smaller KKT error
+        average_x, average_y, average_z = sum_x / sum_weight, sum_y / sum_weight, sum_z / sum_weight
+        average_Ax, average_ATy = operator.matvec(average_x), operator.rmatvec(average_y)
+        average = _kkt_error(operator, c, average_x, average_y, average_z, average_Ax, average_ATy)
+        if average["kkt"] < current["kkt"]:
+            candidate, candidate_iterate = average, (average_x, average_y, average_z, average_Ax, average_ATy)
+        else:
+            candidate, candidate_iterate = current, (x, y, z, Ax, ATy)
+        if (candidate["kkt"] <= 0.2 * restart_kkt
+                or (candidate["kkt"] <= 0.8 * restart_kkt and candidate["kkt"] > previous_candidate_kkt)
+                or inner_iterations >= 0.36 * iteration):
+            x, y, z, Ax, ATy = candidate_iterate
+            # rebalance the primal weight towards the observed ratio of dual to primal movement
+            primal_movement = np.linalg.norm(x - restart_x)
+            dual_movement = np.sqrt(np.sum((y - restart_y) ** 2) + (z - restart_z) ** 2)
+            if primal_movement > 1e-10 and dual_movement > 1e-10:
+                primal_weight = np.exp(0.5 * np.log(dual_movement / primal_movement) + 0.5 * np.log(primal_weight))
+            restart_x, restart_y, restart_z, restart_kkt = x.copy(), y.copy(), z, candidate["kkt"]
+            sum_x, sum_y, sum_z, sum_weight = np.zeros_like(x), np.zeros_like(y), 0.0, 0.0
+            previous_candidate_kkt = np.inf
+            inner_iterations = 0
+            restarts += 1
+        else:
+            previous_candidate_kkt = candidate["kkt"]
+
+    if errors is None:
+        errors = _kkt_error(operator, c, x, y, z, Ax, ATy)
+    report = {
+        "status": status,
+        "mode": mode,
+        "iterations": iteration,
+        "restarts": restarts,
+        "primal_residual": errors["primal_residual"],
+        "dual_residual": errors["dual_residual"],
+        "gap": errors["gap"],
+        "welfare": -errors["primal_objective"],
+        "step_size": step_size,
+        "primal_weight": primal_weight,
+        "dual": (y, z),
+    }
+    if debug:
+        print("\nPDHG report:\n", {key: value for key, value in report.items() if key != "dual"})
+    return x, report
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,137 @@
+# size estimates for the correlated equilibrium LP and the solver path they imply
+#
+# everything here is computed from the strategy counts and the mode alone, so a plan is made before anything of size
+# S^N is allocated and a game that would not fit is rejected instead of being killed halfway through building A_ub
+import numpy as np
+from typing import Dict, Tuple, Union
+
+DEFAULT_MEMORY_BUDGET = 2 ** 31
+# rough single core costs measured for numpy and HiGHS, only meant to rank the paths against each other and a budget
+SECONDS_PER_UTILITY_CALL = 1e-6
+SECONDS_PER_PROFILE = 5e-6
+LP_SECONDS = 1e-2
+# simplex time grows faster than the number of nonzeros, so this multiplies nnz^1.5
+LP_SECONDS_PER_NONZERO = 5e-9
+DENSE_SECONDS_PER_ENTRY = 5e-9
+SPARSE_SECONDS_PER_NONZERO = 2e-7
+PDHG_ITERATIONS = 10000
+PDHG_SECONDS_PER_ENTRY = 4e-9
+# a distribution entry is a Python list holding a float and a tuple of strategy indices
+PROFILE_BYTES = 120
+PROFILE_BYTES_PER_PLAYER = 8
+# the sparsity pattern, its sort order, the coefficients and HiGHS's own CSR copy
+SPARSE_BYTES_PER_NONZERO = 72
+# HiGHS keeps its own sparse copy of a dense A_ub
+DENSE_COPY_BYTES_PER_NONZERO = 16
+PDHG_VECTORS = 10
+# the pure equilibrium scan holds the welfare tensor, a boolean best response mask per player and a few boolean temporaries,
+# the constant-sum check only the payoff sum
+CHECK_BYTES_PER_PROFILE = 12
+CHECK_BYTES_PER_PLAYER_PROFILE = 1
+
+EXACT_METHODS = ("pure", "minimax", "highs", "sparse")
+
+def estimate_size(shape: Tuple[int, ...], mode: str = "ce", tabulated: bool = True) -> Dict[str, int]:
+    """
+    Estimates the size of the LP for a game with the given number of strategies per player.
+
+    Parameters:
+    shape (tuple): the number of strategies of each player.
+    mode (str): "ce" or "cce".
+    tabulated (bool): True when utilities are given as a tensor (ce_fast), False when every entry of A_ub and the
+        objective comes from calling a utility function (ce_basic).
+
+    Returns:
+    dict: The number of players, profiles, constraint rows, constraint nonzeros and utility calls, and the bytes
+        taken by the utility tensor, the distribution list, a dense A_ub and the sparse pattern.
+    """
+    if mode not in ("ce", "cce"):
+        raise ValueError("Unknown equilibrium mode", mode)
+    num_players = len(shape)
+    num_profiles = int(np.prod(shape, dtype=object))
+    num_rows = sum(s * (s - 1) if mode == "ce" else s for s in shape)
+    # every profile appears once in a row for each alternate of each player's signaled strategy, in both modes
+    nonzeros = num_profiles * sum(s - 1 for s in shape)
+    return {
+        "num_players": num_players,
+        "num_profiles": num_profiles,
+        "num_rows": num_rows,
+        "nonzeros": nonzeros,
+        # ce_basic calls each utility once per profile for the objective and twice per nonzero for A_ub
+        "utility_calls": 0 if tabulated else num_players * num_profiles + 2 * nonzeros,
+        "tensor_bytes": 8 * num_players * num_profiles if tabulated else 0,
+        "distribution_bytes": num_profiles * (PROFILE_BYTES + PROFILE_BYTES_PER_PLAYER * num_players),
+        "dense_bytes": 8 * num_rows * num_profiles,
+        "sparse_bytes": SPARSE_BYTES_PER_NONZERO * nonzeros,
+    }
+
+def estimate_method(size: Dict[str, int], method: str) -> Tuple[int, float]:
+    """
+    Returns:
+    tuple: The estimated peak bytes and seconds of solving with the given method.
+    """
+    held = size["tensor_bytes"] + size["distribution_bytes"]
+    lp_seconds = LP_SECONDS + LP_SECONDS_PER_NONZERO * size["nonzeros"] ** 1.5
+    call_seconds = SECONDS_PER_UTILITY_CALL * size["utility_calls"]
+    if method == "highs":
+        return (held + size["dense_bytes"] + DENSE_COPY_BYTES_PER_NONZERO * size["nonzeros"],
+                call_seconds + lp_seconds + DENSE_SECONDS_PER_ENTRY * size["num_rows"] * size["num_profiles"]
+                + SECONDS_PER_PROFILE * size["num_profiles"])
+    if method == "sparse":
+        return (held + size["sparse_bytes"],
+                call_seconds + lp_seconds + SPARSE_SECONDS_PER_NONZERO * size["nonzeros"] + SECONDS_PER_PROFILE * size["num_profiles"])
+    if method == "pure":
+        # a scan of every player's best responses, then a single profile is written out
+        return held + size["tensor_bytes"], SECONDS_PER_PROFILE * size["num_profiles"]
+    if method == "minimax":
+        # two LPs with a row per opponent strategy cost no more than the fixed overhead, then the product is written out
+        return held + 8 * size["num_profiles"], LP_SECONDS + SECONDS_PER_PROFILE * size["num_profiles"]
+    if method == "pdhg":
+        # each iteration is a product with A_ub and its transpose, both contractions of the whole utility tensor
+        entries = size["num_profiles"] * (size["num_players"] + size["nonzeros"] // max(size["num_profiles"], 1))
+        return (held + 8 * (size["num_players"] + PDHG_VECTORS) * size["num_profiles"] + 32 * size["num_rows"],
+                call_seconds + PDHG_ITERATIONS * PDHG_SECONDS_PER_ENTRY * entries)
+    raise ValueError("Unknown optimization method", method)
+
+def estimate_checks(size: Dict[str, int]) -> int:
+    """
+    Returns:
+    int: The estimated peak bytes of the pure equilibrium and constant-sum checks that can unlock the "pure" and
+        "minimax" paths, including the utility tensor they scan.
+    """
+    return size["tensor_bytes"] + (CHECK_BYTES_PER_PROFILE + CHECK_BYTES_PER_PLAYER_PROFILE * size["num_players"]) * size["num_profiles"]
+
+def choose_plan(shape: Tuple[int, ...], mode: str = "ce", tabulated: bool = True, methods: Tuple[str, ...] = ("highs", "sparse", "pdhg"),
+                memory_budget: Union[int, None] = None, time_budget: Union[float, None] = None) -> Dict:
+    """
+    Picks the cheapest solver path that fits the budgets. Exact paths are preferred, the fastest estimate first,
+    and the approximate first-order solver is only chosen when no exact path fits.
+
+    Parameters:
+    shape (tuple): the number of strategies of each player.
+    mode (str): "ce" or "cce".
+    tabulated (bool): whether utilities are a tensor, see estimate_size.
+    methods (tuple): the methods the engine supports.
+    memory_budget (int): the peak bytes allowed, defaults to DEFAULT_MEMORY_BUDGET.
+    time_budget (float): the seconds allowed, unlimited by default.
+
+    Returns:
+    dict: The chosen method, the size estimates, every candidate's estimated bytes and seconds, and the budgets.
+    """
+    memory_budget = DEFAULT_MEMORY_BUDGET if memory_budget is None else memory_budget
+    size = estimate_size(shape, mode, tabulated)
+    candidates = []
+    for method in methods:
+        peak_bytes, seconds = estimate_method(size, method)
+        viable = peak_bytes <= memory_budget and (time_budget is None or seconds <= time_budget)
+        candidates.append({"method": method, "bytes": peak_bytes, "seconds": seconds, "viable": viable})
+    plan = {"method": None, "mode": mode, "estimates": size, "candidates": candidates, "memory_budget": memory_budget, "time_budget": time_budget}
+    viable = [candidate for candidate in candidates if candidate["viable"]]
+    exact = [candidate for candidate in viable if candidate["method"] in EXACT_METHODS]
+    if not viable:
+        raise ValueError("No solver path fits the budget", plan)
+    plan["method"] = min(exact or viable, key=lambda candidate: candidate["seconds"])["method"]
+    return plan
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,170 @@
+# warm-started re-solves of the correlated equilibrium LP for a stream of perturbed ce_fast utility tensors
+#
+# the profile space and the sparsity pattern of A_ub only depend on the number of players and strategies, so they are
+# built once; each perturbation patches the changed coefficients and costs in place and HiGHS restarts the simplex
+# from the previous optimal basis
+#
+# the warm start needs the highspy bindings (pip install highspy); without them every solve is a cold linprog
+import time
+import numpy as np
+from scipy.optimize import linprog
+from scipy.sparse import csr_matrix
+from typing import List, Dict, Tuple, Union
+
+try:
+    from highspy import Highs
+except ImportError:
+    Highs = None
+
+def build_ic_pattern(shape: Tuple[int, ...], mode: str = "ce") -> Dict[str, np.ndarray]:
+    """
+    Builds the structural nonzeros of A_ub, in the same row order as ce_fast's build_ic_constraints / build_cce_constraints.
+    Every entry is the utility of a deviation profile minus the utility of a signaled profile for one player.
+
+    Returns:
+    dict: Arrays of each nonzero's row, column (signaled profile), player and deviation profile, and the number of rows.
+    """
+    num_players = len(shape)
+    num_profiles = int(np.prod(shape))
+    profiles = np.arange(num_profiles)
+    strides = [int(np.prod(shape[n + 1:])) for n in range(num_players)]
+    rows, cols, players, deviations = [], [], [], []
+    row_offset = 0
+    for n in range(num_players):
+        num_strategies = shape[n]
+        signaled = (profiles // strides[n]) % num_strategies
+        for alternate_strategy in range(num_strategies):
+            mask = signaled != alternate_strategy
+            if mode == "ce":
+                # rows for signaled strategy s skip the alternate s, so alternates above s shift down by one
+                row = row_offset + signaled[mask] * (num_strategies - 1) + alternate_strategy - (alternate_strategy > signaled[mask])
+            else:
+                row = np.full(np.count_nonzero(mask), row_offset + alternate_strategy)
+            rows.append(row)
+            cols.append(profiles[mask])
+            players.append(np.full(np.count_nonzero(mask), n))
+            deviations.append(profiles[mask] + (alternate_strategy - signaled[mask]) * strides[n])
+        row_offset += num_strategies * (num_strategies - 1) if mode == "ce" else num_strategies
+    pattern = {key: np.concatenate(value) for key, value in [("rows", rows), ("cols", cols), ("players", players), ("deviations", deviations)]}
+    # HiGHS takes the matrix column by column
+    order = np.lexsort((pattern["rows"], pattern["cols"]))
+    pattern = {key: value[order] for key, value in pattern.items()}
+    pattern["num_rows"] = row_offset
+    return pattern
+
+class Perturbation_resolver:
+    debug: bool = False
+
+    def __init__(self, utilities: np.ndarray, lambdas: Union[List[float], None] = None, mode: str = "ce", debug: bool = False):
+        if mode not in ("ce", "cce"):
+            raise ValueError("Unknown equilibrium mode", mode)
+        self.utilities = np.array(utilities, dtype=float)
+        self.shape = self.utilities.shape[1:]
+        self.num_profiles = int(np.prod(self.shape))
+        self.lambdas = np.ones(self.utilities.shape[0]) if lambdas is None else np.asarray(lambdas, dtype=float)
+        self.mode = mode
+        self.debug = debug
+        self.pattern = build_ic_pattern(self.shape, mode)
+        self.coefficients = self.get_coefficients(self.utilities)
+        self.costs = self.get_costs(self.utilities)
+        self.distribution: np.ndarray = None
+        self.highs = self.build_model() if Highs is not None else None
+
+    @classmethod
+    def from_equilibrium(cls, ce, mode: str = "ce") -> "Perturbation_resolver":
+        """
+        Creates a resolver from a ce_fast Correlated_equilibrium with its players already added.
+        """
+        return cls(ce.utilities, ce.get_lambdas(), mode, ce.debug)
+
+    def get_coefficients(self, utilities: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The value of every structural nonzero of A_ub for the given utility tensor.
+        """
+        flat = utilities.reshape(utilities.shape[0], -1)
+        return flat[self.pattern["players"], self.pattern["deviations"]] - flat[self.pattern["players"], self.pattern["cols"]]
+
+    def get_costs(self, utilities: np.ndarray) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The objective, the negated lambda-weighted utility sum of every profile.
+        """
+        return -(self.lambdas @ utilities.reshape(utilities.shape[0], -1))
+
+    def build_model(self):
+        """
+        Passes the LP to HiGHS once. HiGHS drops the pattern's explicit zeros, so patching a coefficient that was zero
+        relies on changeCoeff inserting the entry again.
+        """
+        highs = Highs()
+        highs.setOptionValue("output_flag", self.debug)
+        num_rows = self.pattern["num_rows"]
+        highs.addVars(self.num_profiles, np.zeros(self.num_profiles), np.full(self.num_profiles, np.inf))
+        highs.changeColsCost(self.num_profiles, np.arange(self.num_profiles, dtype=np.int32), self.costs)
+        # IC rows are <= 0, and the last row constrains all probabilities to sum to 1
+        row_starts = np.searchsorted(np.sort(self.pattern["rows"]), np.arange(num_rows)).astype(np.int32)
+        row_order = np.argsort(self.pattern["rows"], kind="stable")
+        highs.addRows(num_rows, np.full(num_rows, -np.inf), np.zeros(num_rows), len(row_order), row_starts,
+                      self.pattern["cols"][row_order].astype(np.int32), self.coefficients[row_order])
+        highs.addRows(1, np.ones(1), np.ones(1), self.num_profiles, np.zeros(1, dtype=np.int32),
+                      np.arange(self.num_profiles, dtype=np.int32), np.ones(self.num_profiles))
+        return highs
+
+    def solve(self, utilities: Union[np.ndarray, None] = None) -> Tuple[np.ndarray, Dict]:
+        """
+        Solves the LP for a perturbed utility tensor of the same shape, or for the current one if none is given,
+        patching only the coefficients and costs that changed and warm starting from the previous solve.
+
+        Returns:
+        tuple: The distribution as a tensor over strategy profiles and a report dict describing the solve.
+        """
+        start = time.perf_counter()
+        changed_coefficients, changed_costs = np.array([], dtype=int), np.array([], dtype=int)
+        if utilities is not None:
+            utilities = np.asarray(utilities, dtype=float)
+            if utilities.shape != self.utilities.shape:
+                raise ValueError("Perturbed utilities must keep the shape", self.utilities.shape)
+            coefficients, costs = self.get_coefficients(utilities), self.get_costs(utilities)
+            changed_coefficients = np.flatnonzero(coefficients != self.coefficients)
+            changed_costs = np.flatnonzero(costs != self.costs)
+            self.utilities, self.coefficients, self.costs = utilities, coefficients, costs
+            if self.highs is not None:
+                for index in changed_coefficients:
+                    self.highs.changeCoeff(int(self.pattern["rows"][index]), int(self.pattern["cols"][index]), float(coefficients[index]))
+                if len(changed_costs):
+                    self.highs.changeColsCost(len(changed_costs), changed_costs.astype(np.int32), costs[changed_costs])
+
+        if self.highs is not None:
+            self.highs.run()
+            status = self.highs.modelStatusToString(self.highs.getModelStatus())
+            if status != "Optimal":
+                raise ValueError("Linear programming failed to find a solution", status)
+            self.distribution = np.array(self.highs.getSolution().col_value).reshape(self.shape)
+            iterations = self.highs.getInfo().simplex_iteration_count
+            backend = "highs"
+        else:
+            num_rows = self.pattern["num_rows"]
+            A_ub = csr_matrix((self.coefficients, (self.pattern["rows"], self.pattern["cols"])), shape=(num_rows, self.num_profiles))
+            res = linprog(self.costs, A_ub=A_ub, b_ub=np.zeros(num_rows), A_eq=np.ones((1, self.num_profiles)), b_eq=np.ones(1),
+                          bounds=(0, None), method="highs")
+            if res.x is None:
+                raise ValueError("Linear programming failed to find a solution", res.message)
+            self.distribution = res.x.reshape(self.shape)
+            status, iterations, backend = "Optimal", res.nit, "linprog"
+
+        report = {
+            "status": status,
+            "backend": backend,
+            "iterations": iterations,
+            "welfare": float(-np.sum(self.costs * self.distribution.ravel())),
+            "changed_coefficients": len(changed_coefficients),
+            "changed_costs": len(changed_costs),
+            "seconds": time.perf_counter() - start,
+        }
+        if self.debug:
+            print("\nRe-solve report:\n", report)
+        return self.distribution, report
+
+if __name__ == "__main__":
+    pass
@@ -0,0 +1,234 @@
+# asyncio service handing out correlated equilibrium recommendations, the off-chain counterpart of CorrelatedPlanner
+#
+# every round is one joint draw from the equilibrium; each player is served their own component of each round in order,
+# so the recommendations handed to different players in the same round always come from the same joint profile
+import asyncio
+import time
+import numpy as np
+from typing import List, Dict, Tuple, Union
+
+def sample_rounds(cumulative: np.ndarray, shape: Tuple[int, ...], num_rounds: int, rng: np.random.Generator) -> np.ndarray:
+    """
+    Draws joint strategy profiles from a distribution given by its cumulative probabilities over C-ordered profiles.
+
+    Returns:
+    np.ndarray: A (num_rounds, N) array of strategy indices, one row per joint draw.
+    """
+    profile_indices = np.searchsorted(cumulative, rng.random(num_rounds) * cumulative[-1], side="right")
+    profile_indices = np.minimum(profile_indices, len(cumulative) - 1)
+    return np.stack(np.unravel_index(profile_indices, shape), axis=1).astype(np.min_scalar_type(max(shape)))
+
+class Recommendation_service:
+    debug: bool = False
+
+    def __init__(self, players: List[str], strategies: List[str], probabilities: np.ndarray, batch_size: int = 4096,
+                 max_batches: int = 16, seed: Union[int, None] = None, debug: bool = False,
+                 player_strategies: Union[List[List[str]], None] = None):
+        if max_batches < 1:
+            raise ValueError("At least one batch of rounds must be kept", max_batches)
+        self.player_map: List[str] = players
+        self.player_index: Dict[str, int] = {player: n for n, player in enumerate(players)}
+        self.strategy_map: List[str] = strategies
+        # each player's own strategy names, strategies unless others were given
+        self.player_strategy_maps: List[List[str]] = [strategies for _ in players] if player_strategies is None else [list(names) for names in player_strategies]
+        self.batch_size = batch_size
+        self.max_batches = max_batches
+        # the refill thread gets its own generator so it never shares one with a swap on the event loop
+        self.rng, self.refill_rng = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(2)]
+        self.debug = debug
+        # rounds are stored in batches of batch_size starting at multiples of batch_size, at most max_batches at a time
+        self.batches: Dict[int, np.ndarray] = {}
+        self.num_rounds = 0
+        self.oldest_round = 0
+        self.cursors: List[int] = [0 for _ in players]
+        self.max_cursor = 0
+        self.generation = 0
+        self.refill_task: Union[asyncio.Task, None] = None
+        self.set_probabilities(probabilities)
+
+    @classmethod
+    def from_equilibrium(cls, ce, **kwargs) -> "Recommendation_service":
+        """
+        Creates a service from a solved ce_fast Correlated_equilibrium.
+        """
+        if not ce.distribution:
+            ce.optimize_distribution()
+        return cls(ce.player_map, ce.strategy_map, cls.get_probabilities(ce), player_strategies=ce.player_strategy_maps, **kwargs)
+
+    @staticmethod
+    def get_probabilities(ce) -> np.ndarray:
+        """
+        Returns:
+        np.ndarray: The solved distribution of a ce_fast Correlated_equilibrium as a tensor over strategy profiles.
+        """
+        return np.array([dist_entry[0] for dist_entry in ce.distribution]).reshape(tuple(len(names) for names in ce.player_strategy_maps))
+
+    def set_probabilities(self, probabilities: np.ndarray):
+        """
+        Validates a distribution tensor over strategy profiles and stores its cumulative probabilities for sampling.
+        """
+        probabilities = np.maximum(np.asarray(probabilities, dtype=float), 0)
+        shape = tuple(len(names) for names in self.player_strategy_maps)
+        if probabilities.shape != shape:
+            raise ValueError("Distribution must have one axis per player of the size of their strategies", shape)
+        if probabilities.sum() <= 0:
+            raise ValueError("Distribution has no probability mass")
+        self.shape = probabilities.shape
+        self.cumulative = np.cumsum(probabilities.ravel())
+
+    def swap_equilibrium(self, probabilities: np.ndarray):
+        """
+        Hot-swaps the equilibrium being served. Rounds already handed to some player are finished from the old
+        equilibrium so every round stays a single joint draw; all rounds nobody has seen yet are redrawn.
+        """
+        self.set_probabilities(probabilities)
+        self.generation += 1
+        for base in sorted(self.batches):
+            start = max(self.max_cursor - base, 0)
+            if start < self.batch_size:
+                self.batches[base][start:] = sample_rounds(self.cumulative, self.shape, self.batch_size - start, self.rng)
+        if self.debug:
+            print("\nSwapped equilibrium, generation", self.generation, "redrawing rounds from", self.max_cursor)
+
+    async def refill(self):
+        """
+        Samples the next batch of rounds off the event loop, resampling if the equilibrium was swapped meanwhile.
+        """
+        while True:
+            generation, cumulative, shape = self.generation, self.cumulative, self.shape
+            rounds = await asyncio.to_thread(sample_rounds, cumulative, shape, self.batch_size, self.refill_rng)
+            if generation == self.generation:
+                break
+        self.batches[self.num_rounds] = rounds
+        self.num_rounds += self.batch_size
+        # batches every player has moved past can be dropped, and rounds older than the window expire so an idle
+        # player can't keep every batch alive; lagging players skip ahead to the oldest live round
+        expired = max(min(self.cursors), self.num_rounds - self.max_batches * self.batch_size)
+        for base in [base for base in self.batches if base + self.batch_size <= expired]:
+            del self.batches[base]
+        self.oldest_round = min(self.batches)
+        if self.debug:
+            print("\nSampled rounds up to", self.num_rounds, "holding", len(self.batches), "batches")
+
+    async def ensure_rounds(self, cursor: int):
+        """
+        Waits until the round at the cursor has been sampled, starting a refill if none is running.
+        """
+        while cursor >= self.num_rounds:
+            if self.refill_task is None or self.refill_task.done():
+                self.refill_task = asyncio.create_task(self.refill())
+            await asyncio.shield(self.refill_task)
+
+    async def recommend(self, player: str) -> Tuple[int, str]:
+        """
+        Serves the player's component of the next round they have not yet been served, or of the oldest live round
+        if the player fell further behind than the max_batches window.
+
+        Returns:
+        tuple: The round index and the recommended strategy.
+        """
+        n = self.player_index[player]
+        while True:
+            # reserve the round before waiting, so overlapping requests for the same player get consecutive rounds
+            cursor = max(self.cursors[n], self.oldest_round)
+            self.cursors[n] = cursor + 1
+            if cursor >= self.num_rounds:
+                await self.ensure_rounds(cursor)
+            batch = self.batches.get(cursor - cursor % self.batch_size)
+            # only a request that waited behind more than max_batches refills can find its round expired
+            if batch is not None:
+                break
+        strategy = batch[cursor % self.batch_size, n]
+        if cursor + 1 > self.max_cursor:
+            self.max_cursor = cursor + 1
+            # pre-sample the next batch once the furthest player is half way through the last one
+            if self.num_rounds - self.max_cursor < self.batch_size // 2 and (self.refill_task is None or self.refill_task.done()):
+                self.refill_task = asyncio.create_task(self.refill())
+        return cursor, self.player_strategy_maps[n][strategy]
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """
+        Line protocol: each request line is a player name, each response line is "<round> <strategy>" or "ERR <message>".
+        """
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                player = line.decode().strip()
+                if player in self.player_index:
+                    round_index, strategy = await self.recommend(player)
+                    writer.write(f"{round_index} {strategy}\n".encode())
+                else:
+                    writer.write(f"ERR unknown player {player}\n".encode())
+                await writer.drain()
+        except ConnectionResetError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str = "127.0.0.1", port: int = 0) -> asyncio.AbstractServer:
+        """
+        Starts a TCP server for the line protocol. Use port 0 to pick a free port.
+        """
+        await self.ensure_rounds(0)
+        return await asyncio.start_server(self.handle_client, host, port)
+
+async def generate_load(target: Union[Recommendation_service, Tuple[str, int]], players: List[str], num_clients: int = 100,
+                        requests_per_client: int = 1000) -> Dict[str, float]:
+    """
+    Runs concurrent clients against a service, in-process or over TCP given (host, port), each requesting
+    recommendations for one player in a loop.
+
+    Returns:
+    dict: The number of requests, wall time, throughput and latency percentiles in milliseconds.
+    """
+    latencies = np.empty((num_clients, requests_per_client))
+
+    async def in_process_client(client: int):
+        player = players[client % len(players)]
+        for request in range(requests_per_client):
+            start = time.perf_counter()
+            await target.recommend(player)
+            latencies[client, request] = time.perf_counter() - start
+            if request % 64 == 63:
+                # yield so in-process clients interleave like socket clients do
+                await asyncio.sleep(0)
+
+    async def socket_client(client: int):
+        player = (players[client % len(players)] + "\n").encode()
+        reader, writer = await asyncio.open_connection(*target)
+        for request in range(requests_per_client):
+            start = time.perf_counter()
+            writer.write(player)
+            response = await reader.readline()
+            latencies[client, request] = time.perf_counter() - start
+            if response.startswith(b"ERR"):
+                raise ValueError("Service returned an error", response.decode().strip())
+        writer.close()
+
+    client = in_process_client if isinstance(target, Recommendation_service) else socket_client
+    start = time.perf_counter()
+    await asyncio.gather(*(client(i) for i in range(num_clients)))
+    elapsed = time.perf_counter() - start
+    total = num_clients * requests_per_client
+    return {
+        "requests": total,
+        "seconds": elapsed,
+        "throughput": total / elapsed,
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "max_ms": float(latencies.max() * 1000),
+    }
+
+if __name__ == "__main__":
+    async def main():
+        rng = np.random.default_rng(0)
+        players = [f"P{n}" for n in range(4)]
+        service = Recommendation_service(players, ["a", "b", "c"], rng.random((3,) * 4), seed=0)
+        print("in-process:", await generate_load(service, players))
+        server = await service.serve()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            print("tcp:", await generate_load(("127.0.0.1", port), players, requests_per_client=200))
+    asyncio.run(main())
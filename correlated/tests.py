@@ -1,6 +1,19 @@
+import os
+import sys
+# the shared normal_form package lives at the repo root, so running the tests from this directory needs it on the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from ce_basic import Correlated_equilibrium as ce_basic
 from ce_fast import Correlated_equilibrium as ce_fast
 from typing import Dict, Callable
+from ce_pdhg import Ic_operator
+from ce_graphical import Graphical_game
+from ce_service import Recommendation_service, generate_load
+from ce_export import export_distribution, decode_calldata
+from ce_resolve import Perturbation_resolver, Highs
+from ce_blocks import find_independent_components, solve_by_components
+import asyncio
+import tempfile
+import numpy as np
 
 def test_strategy_enumeration(Correlated_equilibrium,debug: bool = False):
     ce = Correlated_equilibrium(["a", "b", "c"])
@@ -190,6 +203,31 @@ def three_player_game_with_mixed_equilibria(Correlated_equilibrium, debug: bool
                 assert(abs(i["probability"] - j["probability"]) < 0.01), "Probabilities do not match for strategy " + str(i["strategy"])
     print("Three player game with mixed equilibria passed\n")
 
+def game_of_chicken_cce_example(Correlated_equilibrium, debug: bool = False):
+    def get_player_utility(player: str) -> Callable[[Dict[str, str]], float]:
+        strategy_mapping = {"D": 0, "C": 1}
+        u = [[0, 7], [2, 6]] if player == "P1" else [[0, 2], [7, 6]]
+        def player_utility(profile: Dict[str, str]) -> float:
+            return u[strategy_mapping[profile["P1"]]][strategy_mapping[profile["P2"]]]
+        return player_utility
+
+    ce = Correlated_equilibrium(["D", "C"], debug)
+    ce.add_player("P1", get_player_utility("P1"))
+    ce.add_player("P2", get_player_utility("P2"))
+    ce.initialize_distribution()
+    A_ub, _ = ce.build_cce_constraints()
+    assert(A_ub.shape == (2 * 2, 4)), "CCE should have one constraint per player and strategy"
+    distribution = ce.optimize_distribution(mode="cce")
+
+    if debug:
+        print(distribution)
+
+    expected = {("D", "D"): 0, ("D", "C"): 0.25, ("C", "D"): 0.25, ("C", "C"): 0.5}
+    for strategy in distribution:
+        key = (strategy["strategy"]["P1"], strategy["strategy"]["P2"])
+        assert(abs(strategy["probability"] - expected[key]) < 0.01), "CCE probability does not match for strategy " + str(key)
+    print("Game of chicken CCE example passed\n")
+
    ###########################################################################################
    # TESTS FOR CE_FAST
    ###########################################################################################
@@ -237,6 +275,430 @@ def dominant_strategy_example_fast(Correlated_equilibrium, debug: bool = False):
     print("Prof Bryce dominant strategy example passed\n")
 
     
+def three_player_cce_example_fast(Correlated_equilibrium, debug: bool = False):
+    u_1 = [[[1/2, -1, 1], [-1, -3.25, .5], [1, .5, 3.25]], [[3.25, 1, .5], [1, .5, -1], [.5, -1, -3.25]], [[-3.25, .5, -1], [.5, 3.25, 1], [-1, 1, .5]]]
+    u_2 = [[[1/2, -1, 1], [3.25, 1, .5], [-3.25, .5, -1]], [[-1, -3.25, .5], [1, .5, -1], [.5, 3.25, 1]], [[1, .5, 3.25], [.5, -1, -3.25], [-1, 1, .5]]]
+    u_3 = [[[1/2, 3.25, -3.25], [-1, 1, .5], [1, .5, -1]], [[-1, 1, .5], [-3.25, .5, 3.25], [.5, -1, 1]], [[1, .5, -1], [.5, -1, 1], [3.25, -3.25, .5]]]
+
+    ce = Correlated_equilibrium(["r", "p", "s"], debug)
+    for player, u in zip(["P1", "P2", "P3"], [u_1, u_2, u_3]):
+        ce.add_player(player, u)
+    ce.initialize_distribution()
+    A_ub, _ = ce.build_cce_constraints()
+    assert(A_ub.shape == (3 * 3, 27)), "CCE should have one constraint per player and strategy"
+    distribution = ce.optimize_distribution(mode="cce")
+
+    if debug:
+        print(distribution)
+
+    probabilities = np.array([strategy["probability"] for strategy in distribution])
+    assert(abs(probabilities.sum() - 1) < 1e-6), "CCE probabilities should sum to 1"
+    assert(np.all(A_ub @ probabilities <= 1e-6)), "CCE constraints should be satisfied"
+    print("Three player CCE example passed\n")
+
+def pdhg_matches_highs_fast(Correlated_equilibrium, debug: bool = False):
+    rng = np.random.default_rng(0)
+    utilities = rng.normal(size=(3, 4, 4, 4))
+
+    ce = Correlated_equilibrium(["a", "b", "c", "d"], debug)
+    for player in range(3):
+        ce.add_player(str(player), utilities[player])
+    ce.initialize_distribution()
+    x = rng.random((4, 4, 4))
+    for mode, build_constraints in [("ce", ce.build_ic_constraints), ("cce", ce.build_cce_constraints)]:
+        A_ub, _ = build_constraints()
+        operator = Ic_operator(utilities, mode)
+        y = rng.random(A_ub.shape[0])
+        assert(np.allclose(operator.matvec(x), A_ub @ x.ravel())), "Matrix-free A x does not match A_ub for mode " + mode
+        assert(np.allclose(operator.rmatvec(y).ravel(), A_ub.T @ y)), "Matrix-free A^T y does not match A_ub for mode " + mode
+
+    highs_distribution = ce.optimize_distribution()
+    highs_welfare = sum(strategy["probability"] * utilities[:, *profile].sum() for strategy, (_, profile) in zip(highs_distribution, ce.distribution))
+    ce.initialize_distribution()
+    pdhg_distribution = ce.optimize_distribution(method="pdhg")
+    report = ce.solver_report
+
+    if debug:
+        print(pdhg_distribution, report)
+
+    assert(report["status"] == "optimal"), "PDHG did not converge"
+    assert(abs(report["welfare"] - highs_welfare) < 1e-4), "PDHG welfare does not match HiGHS"
+
+    # warm starting from the optimum should terminate immediately
+    ce.optimize_distribution(method="pdhg")
+    assert(ce.solver_report["iterations"] == 0), "PDHG warm start from the optimum should not iterate"
+    print("PDHG matches HiGHS passed\n")
+
+def graphical_game_matches_full_fast(Correlated_equilibrium, debug: bool = False):
+    rng = np.random.default_rng(0)
+    # 4 player chain where each player only cares about their adjacent players
+    neighbors = {0: [1], 1: [0, 2], 2: [1, 3], 3: [2]}
+    tables = [rng.normal(size=(2,) * (1 + len(neighbors[player]))) for player in range(4)]
+
+    game = Graphical_game(["a", "b"], debug)
+    ce = Correlated_equilibrium(["a", "b"], debug)
+    for player in range(4):
+        game.add_player(str(player), [str(neighbor) for neighbor in neighbors[player]], tables[player])
+        full = np.zeros((2,) * 4)
+        for profile in np.ndindex(*full.shape):
+            full[profile] = tables[player][tuple(profile[k] for k in [player] + neighbors[player])]
+        ce.add_player(str(player), full)
+
+    distribution = ce.optimize_distribution()
+    full_welfare = sum(strategy["probability"] * ce.utilities[:, *profile].sum() for strategy, (_, profile) in zip(distribution, ce.distribution))
+    game.optimize_distribution()
+    local_welfare = sum((game.get_neighborhood_marginal(player) * tables[player]).sum() for player in range(4))
+    assert(abs(full_welfare - local_welfare) < 1e-6), "Graphical CE welfare does not match the full CE"
+    sample = game.sample_distribution()
+    assert(set(sample.keys()) == {"0", "1", "2", "3"}), "Sampled recommendation should cover every player"
+    print("Graphical game matches full CE passed\n")
+
+def graphical_ring_example(debug: bool = False):
+    rng = np.random.default_rng(1)
+    num_players = 50
+    game = Graphical_game(["a", "b"], debug)
+    for player in range(num_players):
+        game.add_player(str(player), [str((player - 1) % num_players), str((player + 1) % num_players)], rng.normal(size=(2, 2, 2)))
+    game.optimize_distribution()
+
+    for player in range(num_players):
+        marginal = game.get_neighborhood_marginal(player)
+        utility = game.utilities[player]
+        assert(abs(marginal.sum() - 1) < 1e-6), "Neighborhood marginal should sum to 1"
+        for strategy in range(2):
+            regret = ((utility[1 - strategy] - utility[strategy]) * marginal[strategy]).sum()
+            assert(regret < 1e-6), "IC constraint violated for player " + str(player)
+    sample = game.sample_distribution()
+    assert(len(sample) == num_players), "Sampled recommendation should cover every player"
+    print("50 player graphical ring example passed\n")
+
+def graphical_sampling_order_example(debug: bool = False):
+    rng = np.random.default_rng(18)
+    num_players = 8
+    neighbors = {player: set() for player in range(num_players)}
+    for a in range(num_players):
+        for b in range(a + 1, num_players):
+            if rng.random() < 0.3:
+                neighbors[a].add(b)
+                neighbors[b].add(a)
+    game = Graphical_game(["a", "b"], debug)
+    for player in range(num_players):
+        game.add_player(str(player), [str(neighbor) for neighbor in sorted(neighbors[player])], rng.normal(size=(2,) * (1 + len(neighbors[player]))))
+    game.optimize_distribution()
+    # bag merging leaves some parents before their children in elimination order
+    assert(any(0 <= parent <= index for index, parent in enumerate(game.parents))), "Example should have a parent before its child"
+    order = game.get_sampling_order()
+    assert(sorted(order) == list(range(len(game.bags)))), "Sampling order should visit every bag once"
+    for index, parent in enumerate(game.parents):
+        if parent >= 0:
+            assert(order.index(parent) < order.index(index)), "Parent bag should be sampled before its child"
+    sample = game.sample_distribution()
+    assert(len(sample) == num_players), "Sampled recommendation should cover every player"
+    print("Graphical sampling order example passed\n")
+
+def recommendation_service_example(debug: bool = False):
+    async def run():
+        # all mass on matching profiles, so both players must always be told the same thing in the same round
+        matching = np.array([[0.5, 0], [0, 0.5]])
+        service = Recommendation_service(["P1", "P2"], ["L", "R"], matching, batch_size=64, seed=0, debug=debug)
+        first = [await service.recommend("P1") for _ in range(100)]
+        second = [await service.recommend("P2") for _ in range(50)]
+        assert(all(first[i] == second[i] for i in range(50))), "Players in the same round should share a joint draw"
+
+        # P2 still has rounds 50-99 outstanding, which must be finished from the old equilibrium
+        service.swap_equilibrium(np.array([[0, 1], [0, 0]]))
+        second += [await service.recommend("P2") for _ in range(50)]
+        assert(all(first[i] == second[i] for i in range(100))), "Hot swap should not break rounds already in progress"
+        after_swap = [await service.recommend("P1") for _ in range(200)]
+        assert(all(strategy == "L" for _, strategy in after_swap)), "New rounds should come from the swapped equilibrium"
+
+        # overlapping requests for the same player waiting on a refill must each get their own round
+        service = Recommendation_service(["P1", "P2"], ["L", "R"], matching, batch_size=8, seed=0, debug=debug)
+        concurrent = await asyncio.gather(*(service.recommend("P1") for _ in range(20)))
+        assert(sorted(round_index for round_index, _ in concurrent) == list(range(20))), "Concurrent requests should get distinct consecutive rounds"
+
+        # an idle player must not keep every batch alive, and skips ahead to the oldest live round when they return
+        service = Recommendation_service(["P1", "P2"], ["L", "R"], matching, batch_size=8, max_batches=4, seed=0, debug=debug)
+        first = [await service.recommend("P1") for _ in range(1000)]
+        assert(len(service.batches) <= 4), "Backlog should be capped at max_batches"
+        round_index, strategy = await service.recommend("P2")
+        assert(round_index == service.oldest_round >= 1000 - 4 * 8), "Lagging player should skip ahead to the oldest live round"
+        assert(first[round_index] == (round_index, strategy)), "Skipped ahead player should share the round's joint draw"
+
+        server = await service.serve()
+        port = server.sockets[0].getsockname()[1]
+        async with server:
+            report = await generate_load(("127.0.0.1", port), ["P1", "P2"], num_clients=10, requests_per_client=100)
+        if debug:
+            print(report)
+        assert(report["requests"] == 1000 and report["p99_ms"] > 0), "Load generator should report every request"
+    asyncio.run(run())
+    print("Recommendation service example passed\n")
+
+def export_calldata_example_fast(Correlated_equilibrium, debug: bool = False):
+    ce = Correlated_equilibrium(["D", "C"], debug)
+    ce.add_player("P1", [[0, 7], [2, 6]])
+    ce.add_player("P2", [[0, 2], [7, 6]])
+    ce.optimize_distribution()
+    probabilities = np.array([dist_entry[0] for dist_entry in ce.distribution]).reshape(2, 2)
+    calldata, report = export_distribution(probabilities)
+    assert(calldata[:4].hex() == "c77ea585"), "Calldata should start with the set_correlated_equilibrium selector"
+
+    if debug:
+        print(report)
+
+    profiles, fixed_point = decode_calldata(calldata)
+    assert(sum(fixed_point) == 10 ** 18), "Fixed point probabilities should sum to exactly 1"
+    assert(report["support_size"] == 3 and report["bits_per_strategy"] == 1), "(D, D) should be pruned from the support"
+    for profile, probability in zip(profiles, fixed_point):
+        assert(abs(probability / 10 ** 18 - probabilities[tuple(profile)]) < 1e-9), "Decoded probability does not match for " + str(profile)
+    print("Export calldata example passed\n")
+
+def perturbation_resolver_example_fast(Correlated_equilibrium, debug: bool = False):
+    rng = np.random.default_rng(0)
+    utilities = rng.normal(size=(3, 3, 3, 3))
+    ce = Correlated_equilibrium(["a", "b", "c"], debug)
+    for player in range(3):
+        ce.add_player(str(player), utilities[player])
+    resolver = Perturbation_resolver.from_equilibrium(ce)
+    resolver.solve()
+
+    for _ in range(5):
+        perturbed = resolver.utilities.copy()
+        player, profile = rng.integers(3), tuple(rng.integers(3, size=3))
+        perturbed[(player,) + profile] += rng.normal()
+        _, report = resolver.solve(perturbed)
+
+        cold = Correlated_equilibrium(["a", "b", "c"], debug)
+        for n in range(3):
+            cold.add_player(str(n), perturbed[n])
+        distribution = cold.optimize_distribution()
+        cold_welfare = sum(strategy["probability"] * perturbed[:, *profile].sum() for strategy, (_, profile) in zip(distribution, cold.distribution))
+
+        if debug:
+            print(report)
+        # one utility entry appears in S - 1 rows as the signaled profile and S - 1 rows as a deviation
+        assert(report["changed_coefficients"] == 2 * (3 - 1) and report["changed_costs"] == 1), "Only the perturbed entries should be patched"
+        assert(abs(report["welfare"] - cold_welfare) < 1e-6), "Warm re-solve welfare does not match a cold solve"
+        # without highspy every re-solve falls back to a cold linprog
+        assert(report["backend"] == ("highs" if Highs is not None else "linprog")), "Wrong re-solve backend " + report["backend"]
+    if Highs is None:
+        print("highspy is not installed, warm re-solves were skipped and only the cold fallback was tested")
+    print("Perturbation resolver example passed\n")
+
+def separable_game_example(debug: bool = False):
+    # two copies of the game of chicken played by disjoint pairs of players
+    chicken = {"P1": [[0, 7], [2, 6]], "P2": [[0, 2], [7, 6]]}
+    utilities = np.zeros((4, 2, 2, 2, 2))
+    utilities[0] = np.array(chicken["P1"])[:, :, None, None]
+    utilities[1] = np.array(chicken["P2"])[:, :, None, None]
+    utilities[2] = np.array(chicken["P1"])[None, None, :, :]
+    utilities[3] = np.array(chicken["P2"])[None, None, :, :]
+
+    ce = ce_fast(["D", "C"], debug)
+    for player in range(4):
+        ce.add_player("P" + str(player + 1), utilities[player])
+    assert(find_independent_components(ce.utilities) == [[0, 1], [2, 3]]), "Both pairs should be detected as independent"
+    product_distribution = solve_by_components(ce, max_workers=2)
+    distribution = ce.optimize_distribution()
+    # the joint optimum is not unique, so compare welfare and check the product is a CE of the whole game
+    product = np.array([product_distribution.probability(strategy["strategy"]) for strategy in distribution])
+    welfare = utilities.reshape(4, -1).sum(axis=0)
+    assert(abs(product @ welfare - np.array([strategy["probability"] for strategy in distribution]) @ welfare) < 1e-6), "Product CE should have the joint CE welfare"
+    A_ub, b_ub = ce.build_ic_constraints()
+    assert(np.all(A_ub @ product <= b_ub + 1e-6)), "Product CE violates an incentive constraint of the whole game"
+    assert(set(product_distribution.sample_distribution().keys()) == {"P1", "P2", "P3", "P4"}), "Sample should cover every player"
+
+    def get_player_utility(player: str) -> Callable[[Dict[str, str]], float]:
+        strategy_mapping = {"D": 0, "C": 1}
+        pair = ("P1", "P2") if player in ("P1", "P2") else ("P3", "P4")
+        u = chicken["P1"] if player == pair[0] else chicken["P2"]
+        def player_utility(profile: Dict[str, str]) -> float:
+            return u[strategy_mapping[profile[pair[0]]]][strategy_mapping[profile[pair[1]]]]
+        return player_utility
+
+    ce = ce_basic(["D", "C"], debug)
+    for player in ["P1", "P2", "P3", "P4"]:
+        ce.add_player(player, get_player_utility(player))
+    product_distribution = solve_by_components(ce, partition=[["P1", "P2"], ["P3", "P4"]])
+    callable_product = np.array([product_distribution.probability(strategy["strategy"]) for strategy in distribution])
+    assert(np.allclose(callable_product, product, atol=1e-6)), "Callable and tensor components should give the same product CE"
+    print("Separable game example passed\n")
+
+def solver_plan_example_fast(Correlated_equilibrium, debug: bool = False):
+    rng = np.random.default_rng(0)
+    utilities = rng.normal(size=(3, 4, 4, 4))
+
+    ce = Correlated_equilibrium(["a", "b", "c", "d"], debug)
+    for player in range(3):
+        ce.add_player(str(player), utilities[player])
+    ce.initialize_distribution()
+    for mode, build_constraints in [("ce", ce.build_ic_constraints), ("cce", ce.build_cce_constraints)]:
+        A_ub, _ = build_constraints()
+        sparse_A_ub, _ = ce.build_sparse_constraints(mode)
+        assert(np.allclose(sparse_A_ub.toarray(), A_ub)), "Sparse A_ub does not match the dense A_ub for mode " + mode
+        assert(ce.plan_distribution(mode)["estimates"]["nonzeros"] == np.count_nonzero(A_ub)), "Nonzero estimate is wrong for mode " + mode
+
+    dense_welfare = sum(strategy["probability"] * utilities[:, *profile].sum() for strategy, (_, profile) in zip(ce.optimize_distribution(), ce.distribution))
+    sparse_welfare = sum(strategy["probability"] * utilities[:, *profile].sum() for strategy, (_, profile) in zip(ce.optimize_distribution(method="sparse"), ce.distribution))
+    assert(abs(dense_welfare - sparse_welfare) < 1e-6), "Sparse LP welfare does not match the dense LP"
+
+    ce.optimize_distribution(method="auto")
+    assert(ce.solver_plan["method"] in ("highs", "sparse")), "An exact method should be chosen when the budget allows it"
+    assert(ce.solver_plan["checked"]), "Pure and constant-sum checks should run when they fit the budget"
+    # with only enough memory for the matrix-free solver, the plan falls back to it
+    candidates = {candidate["method"]: candidate for candidate in ce.solver_plan["candidates"]}
+    memory_budget = candidates["pdhg"]["bytes"]
+    assert(memory_budget < min(candidates["highs"]["bytes"], candidates["sparse"]["bytes"])), "PDHG should need the least memory"
+    ce.optimize_distribution(method="auto", memory_budget=memory_budget)
+    assert(ce.solver_plan["method"] == "pdhg" and ce.solver_report["status"] == "optimal"), "PDHG should be chosen and converge"
+    ce.optimize_distribution(method="sparse")
+    assert("dual" not in ce.solver_report), "A sparse solve should replace the PDHG report"
+    ce.optimize_distribution(mode="cce", method="pdhg")
+    ce.optimize_distribution(mode="ce")
+    assert(ce.solver_report["mode"] == "ce" and "dual" not in ce.solver_report), "A dense solve should replace the PDHG report"
+
+    # nothing is allocated when no path fits
+    ce = Correlated_equilibrium(["a", "b", "c", "d"], debug)
+    for player in range(3):
+        ce.add_player(str(player), utilities[player])
+    try:
+        ce.optimize_distribution(method="auto", memory_budget=1024)
+        assert(False), "A plan should not fit in 1KB"
+    except ValueError:
+        assert(ce.distribution is None), "Distribution should not be allocated when the plan is rejected"
+        assert(ce.stacked_utilities is None), "Pure and constant-sum checks should be skipped when they do not fit the budget"
+    basic = ce_basic(["a", "b"], debug)
+    basic.add_player("1", lambda profile: 0)
+    basic.add_player("2", lambda profile: 0)
+    try:
+        basic.optimize_distribution(memory_budget=10 ** 9, time_budget=1e-9)
+        assert(False), "ce_basic plan should not fit in a nanosecond"
+    except ValueError:
+        assert(basic.distribution is None), "Distribution should not be allocated when the plan is rejected"
+    print("Solver plan example passed\n")
+
+def zero_sum_example_fast(Correlated_equilibrium, debug: bool = False):
+    # 2 player rock paper scissors from nash/main.py, every play sums to -3
+    u = np.array([[-1.5, -2, -1], [-1, -1.5, -2], [-2, -1, -1.5]])
+    ce = Correlated_equilibrium(["rock", "paper", "scissors"], debug)
+    ce.add_player("P1", u)
+    ce.add_player("P2", u.T)
+    distribution = ce.optimize_distribution(method="auto")
+    assert(ce.solver_plan["method"] == "minimax"), "Constant-sum games should be routed to the minimax LP"
+    assert(all(abs(strategy["probability"] - 1 / 9) < 1e-9 for strategy in distribution)), "Minimax product should be uniform"
+    assert(all(abs(value + 1.5) < 1e-9 for value in ce.solver_report["values"])), "Both players should get the value -1.5"
+    A_ub, b_ub = ce.build_ic_constraints()
+    assert(np.all(A_ub @ np.array([strategy["probability"] for strategy in distribution]) <= b_ub + 1e-9)), "Minimax product should be a CE"
+
+    ce = Correlated_equilibrium(["D", "C"], debug)
+    ce.add_player("P1", [[0, 7], [2, 6]])
+    ce.add_player("P2", [[0, 2], [7, 6]])
+    ce.optimize_distribution(method="auto")
+    assert(ce.solver_plan["method"] != "minimax"), "Game of chicken is not constant-sum"
+    try:
+        ce.optimize_distribution(method="minimax")
+        assert(False), "Minimax should be rejected for a game that is not constant-sum"
+    except ValueError:
+        pass
+    print("Zero-sum example passed\n")
+
+def pure_equilibrium_example_fast(Correlated_equilibrium, debug: bool = False):
+    # the dominant strategy example, where (R, R) is the only equilibrium and the best profile
+    ce = Correlated_equilibrium(["L", "R"], debug)
+    ce.add_player("P1", [[3, 1], [5, 7]])
+    ce.add_player("P2", [[3, 5], [6, 8]])
+    distribution = ce.optimize_distribution(method="auto")
+    assert(ce.solver_plan["method"] == "pure"), "A welfare maximizing pure equilibrium should skip the LP"
+    for strategy in distribution:
+        expected = 1 if strategy["strategy"] == {"P1": "R", "P2": "R"} else 0
+        assert(strategy["probability"] == expected), "P1 and P2 both playing R should have probability 1"
+
+    # in the prisoner's dilemma the only equilibrium (D, D) is not the best profile, so the LP is still needed
+    ce = Correlated_equilibrium(["C", "D"], debug)
+    ce.add_player("P1", [[3, 0], [5, 1]])
+    ce.add_player("P2", [[3, 5], [0, 1]])
+    distribution = ce.optimize_distribution(method="auto")
+    assert(ce.solver_plan["method"] != "pure"), "Prisoner's dilemma has no welfare maximizing pure equilibrium"
+    assert(abs(distribution[3]["probability"] - 1) < 1e-9), "Prisoner's dilemma CE should be (D, D)"
+    print("Pure equilibrium example passed\n")
+
+def game_file_example_fast(Correlated_equilibrium, debug: bool = False):
+    # the game of chicken as a Gambit payoff file, where the first player's strategy changes fastest
+    path = os.path.join(tempfile.mkdtemp(), "chicken.nfg")
+    with open(path, "w") as file:
+        file.write('NFG 1 R "Game of chicken" { "P1" "P2" }\n{ { "D" "C" } { "D" "C" } }\n""\n\n0 0 2 7 7 2 6 6\n')
+    loaded = Correlated_equilibrium.from_file(path, debug)
+    ce = Correlated_equilibrium(["D", "C"], debug)
+    ce.add_player("P1", [[0, 7], [2, 6]])
+    ce.add_player("P2", [[0, 2], [7, 6]])
+    assert(loaded.player_map == ce.player_map and loaded.strategy_map == ce.strategy_map), "Players and strategies should be read from the file"
+    assert(np.array_equal(loaded.utilities, ce.utilities)), "Loaded utilities do not match the game of chicken"
+    loaded_distribution, distribution = loaded.optimize_distribution(), ce.optimize_distribution()
+    assert(all(abs(a["probability"] - b["probability"]) < 1e-9 for a, b in zip(loaded_distribution, distribution))), "Loaded game should have the same CE"
+    try:
+        ce.add_player("P3", [0, 1])
+        assert(False), "A utility of the wrong shape should be rejected"
+    except ValueError:
+        pass
+    print("Game file example passed\n")
+
+def heterogeneous_strategies_example_fast(Correlated_equilibrium, debug: bool = False):
+    rng = np.random.default_rng(0)
+    counts = (2, 3, 4)
+    utilities = rng.normal(size=(3,) + counts)
+    strategies = [["s" + str(i) for i in range(count)] for count in counts]
+
+    ce = Correlated_equilibrium(strategies[2], debug)
+    for player in range(3):
+        ce.add_player(str(player), utilities[player], strategies[player])
+    ce.initialize_distribution()
+    A_ub, _ = ce.build_ic_constraints()
+    assert(A_ub.shape == (2 + 6 + 12, 24)), "IC rows should only exist for each player's own strategy pairs"
+    assert(np.allclose(ce.build_sparse_constraints()[0].toarray(), A_ub)), "Sparse A_ub does not match the dense A_ub"
+    assert(ce.build_cce_constraints()[0].shape == (2 + 3 + 4, 24)), "CCE rows should only exist for each player's own strategies"
+    distribution = ce.optimize_distribution()
+    welfare = sum(strategy["probability"] * utilities[:, *profile].sum() for strategy, (_, profile) in zip(distribution, ce.distribution))
+    assert(set(strategy["strategy"]["0"] for strategy in distribution) == {"s0", "s1"}), "Player 0 should only have their own strategies"
+
+    async def recommend_all():
+        service = Recommendation_service.from_equilibrium(ce, batch_size=8, seed=0)
+        return [[(await service.recommend(str(player)))[1] for _ in range(20)] for player in range(3)]
+    recommendations = asyncio.run(recommend_all())
+    assert(all(set(recommendations[player]) <= set(strategies[player]) for player in range(3))), "Service should recommend each player's own strategies"
+
+    # padding every player to 4 strategies with strictly dominated ones gives the same optimal welfare with a 64 profile LP
+    padded = np.zeros((3, 4, 4, 4))
+    for player in range(3):
+        padded[player] = -1000
+        padded[player][:2, :3, :4] = utilities[player]
+    padded_ce = Correlated_equilibrium(strategies[2], debug)
+    for player in range(3):
+        padded_ce.add_player(str(player), padded[player])
+    padded_distribution = padded_ce.optimize_distribution()
+    padded_welfare = sum(strategy["probability"] * padded[:, *profile].sum() for strategy, (_, profile) in zip(padded_distribution, padded_ce.distribution))
+    assert(abs(welfare - padded_welfare) < 1e-6), "Padded and heterogeneous games should have the same optimal welfare"
+    assert(ce.plan_distribution()["estimates"]["num_profiles"] == 24), "Plan should size the mixed-radix profile space"
+
+    def get_player_utility(player: int) -> Callable[[Dict[str, str]], float]:
+        def player_utility(profile: Dict[str, str]) -> float:
+            return utilities[player][tuple(strategies[n].index(profile[str(n)]) for n in range(3))]
+        return player_utility
+
+    basic = ce_basic(strategies[2], debug)
+    for player in range(3):
+        basic.add_player(str(player), get_player_utility(player), strategies[player])
+    basic_distribution = basic.optimize_distribution()
+    assert(len(basic_distribution) == 24), "ce_basic should enumerate the mixed-radix profile space"
+    basic_welfare = sum(strategy["probability"] * sum(get_player_utility(player)(strategy["strategy"]) for player in range(3)) for strategy in basic_distribution)
+    assert(abs(welfare - basic_welfare) < 1e-6), "ce_basic and ce_fast should have the same optimal welfare"
+
+    large = Correlated_equilibrium(["a"], debug)
+    for player, count in enumerate((2, 3, 10, 10)):
+        large.add_player(str(player), np.zeros((2, 3, 10, 10)), [str(i) for i in range(count)])
+    assert(len(large.enumerate_strategy_combinations()) == 600), "Strategy counts 2, 3, 10, 10 should give 600 profiles"
+    print("Heterogeneous strategies example passed\n")
+
 
 if __name__ == "__main__":
     print("RUNNING CORRELATED EQUILIBRIUM TESTS...\n\n")
@@ -275,4 +737,43 @@ if __name__ == "__main__":
     test_strategy_enumeration_fast(ce_fast)
 
     print("Testing dominant strategy example...")
-    dominant_strategy_example_fast(ce_fast)
\ No newline at end of file
+    dominant_strategy_example_fast(ce_fast)
+
+    print("Testing CCE examples...")
+    game_of_chicken_cce_example(ce_basic)
+    three_player_cce_example_fast(ce_fast)
+
+    print("Testing PDHG solver...")
+    pdhg_matches_highs_fast(ce_fast)
+
+    print("Testing graphical games...")
+    graphical_game_matches_full_fast(ce_fast)
+    graphical_ring_example()
+    graphical_sampling_order_example()
+
+    print("Testing recommendation service...")
+    recommendation_service_example()
+
+    print("Testing calldata export...")
+    export_calldata_example_fast(ce_fast)
+
+    print("Testing warm re-solves...")
+    perturbation_resolver_example_fast(ce_fast)
+
+    print("Testing block decomposition...")
+    separable_game_example()
+
+    print("Testing solver planning...")
+    solver_plan_example_fast(ce_fast)
+
+    print("Testing zero-sum fast path...")
+    zero_sum_example_fast(ce_fast)
+
+    print("Testing pure equilibrium fast path...")
+    pure_equilibrium_example_fast(ce_fast)
+
+    print("Testing game files...")
+    game_file_example_fast(ce_fast)
+
+    print("Testing heterogeneous strategies...")
+    heterogeneous_strategies_example_fast(ce_fast)
\ No newline at end of file
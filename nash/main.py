@@ -1,6 +1,15 @@
+import os
+import sys
 import random
 import numpy as np
+from itertools import product, islice
 from scipy.optimize import linprog
+if __name__ == "__main__":
+    # run as a script from nash/, so the shared normal_form package at the repo root has to be put on the path
+    sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from normal_form.zero_sum import solve_zero_sum
+from normal_form.pure_equilibria import solve_pure
+from normal_form.game_loader import load_game
 EPS = 1e-5
 # Reference notes for this code can be found at https://www.notion.so/Summer-2024-Notes-b6100cca39664b20b6f53d51b847e80c?pvs=4
 ###
@@ -8,6 +17,39 @@ EPS = 1e-5
 def format_boundary_conditions(boundary_conditions):
     return "\n".join(map(lambda y: str([[f"{z['x']:.3f}", f"{z['y']:.3f}"] for z in y]), boundary_conditions))
 
+###
+# INPUTS
+# S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
+# n: the player to calculate utility for
+# i: the strategy of n the expectation is conditional on
+# chunk_size: the number of plays yielded at a time
+#
+# RETURNS
+# a generator of lists of at most chunk_size plays of the game where player n plays strategy i, each play is a tuple of size N
+# where element v is the index of the strategy player v plays, so only one chunk is ever held in memory
+###
+def iterate_play_indices(S, n, i, chunk_size=1024):
+    plays = product(*[[i] if v == n else range(len(S[v])) for v in range(len(S))])
+    while True:
+        chunk = list(islice(plays, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+###
+# INPUTS
+# S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
+# indices: a play as a tuple of strategy indices, as yielded by iterate_play_indices
+#
+# RETURNS
+# the same play as an array of size N where element v is an array of size S[v] with exactly one element equal to 1
+###
+def one_hot_play(S, indices):
+    play = [[0] * len(row) for row in S]
+    for v, j in enumerate(indices):
+        play[v][j] = 1
+    return play
+
 ###
 # INPUTS
 # S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
@@ -19,69 +61,129 @@ def format_boundary_conditions(boundary_conditions):
 # and each element of the play is an array of size S[n] with exactly one element equal to 1
 ###
 def get_all_plays(S, n, i):
-    plays = []
-    def generate_plays(S, current_play, row, n, i):
-        if row == n:
-            if n == len(S) - 1:
-                plays.append(current_play)
-                return
-            else: 
-                generate_plays(S, current_play, row + 1, n, i)
-                return
-        elif row ==len(S) - 1:
-            for j in range(len(S[row])):
-                new_play = [r[:] for r in current_play]
-                new_play[row][j] = 1
-                plays.append(new_play)
-            return          
-        for j in range(len(S[row])):
-            new_play = [r[:] for r in current_play]
-            new_play[row][j] = 1
-            generate_plays(S, new_play, row + 1, n, i)
-
-    initial_play = [[0] * len(row) for row in S]
-    initial_play[n][i] = 1
-    generate_plays(S, initial_play, 0, n, i)
-    return plays
+    return [one_hot_play(S, indices) for chunk in iterate_play_indices(S, n, i) for indices in chunk]
+
+###
+# INPUTS
+# S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
+# U: array of payoff functions for each player, array where u[n] is the payoff function for player n
+#
+# RETURNS
+# payoffs: an array of shape (N, len(S[0]), ..., len(S[N-1])) where payoffs[n][j_0]...[j_N-1] is u[n] of the play where each player v plays j_v
+###
+def build_payoff_tensor(S, U):
+    shape = tuple(len(strategies) for strategies in S)
+    payoffs = np.zeros((len(U),) + shape)
+    for profile in product(*[range(size) for size in shape]):
+        w = one_hot_play(S, profile)
+        for n in range(len(U)):
+            payoffs[(n,) + profile] = U[n](w)
+    return payoffs
+
+###
+# INPUTS
+# payoffs: the payoff tensor from build_payoff_tensor
+# x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
+# n: the player to calculate utility for
+#
+# RETURNS
+# an array of length S[n] where element i is the expected utility for player n playing i against x[v] for all v != n
+###
+def pure_strategy_utilities(payoffs, x, n):
+    utilities = payoffs[n]
+    # contract the other players' axes from the last to the first so the remaining axis indices do not shift
+    for v in reversed(range(len(x))):
+        if v != n:
+            utilities = np.tensordot(utilities, x[v], axes=([v], [0]))
+    return utilities
+
+###
+# A game in normal form that owns its strategy sets and payoffs, so every solver function takes the game
+# explicitly and independent games can be solved concurrently
+#
+# INPUTS
+# S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
+# U: array of payoff functions for each player, array where u[n] is the payoff function for player n
+# build_tensors: whether to evaluate every payoff function on every play up front,
+#   False keeps the payoffs as callables that are streamed over, for games too large to tabulate
+#
+# ATTRIBUTES
+# N: the number of players
+# K: the dimensionality of the strategy space = sum(len(S[i]) for i in range(N))
+# payoffs: the payoff tensor from build_payoff_tensor, None if build_tensors is False
+#
+# from_payoffs builds a game around an existing payoff tensor and from_file loads one from a .nfg or .npz file,
+# in both cases the payoff functions look plays up in the tensor instead of the tensor being built from them
+###
+class Game:
+    def __init__(self, S, U, build_tensors=True):
+        if len(S) != len(U):
+            raise ValueError("There must be exactly one payoff function per player")
+        self.S = S
+        self.U = U
+        self.N = len(S)
+        self.K = sum(len(strategies) for strategies in S)
+        self.payoffs = None
+        if build_tensors:
+            self.payoffs = build_payoff_tensor(S, U)
+
+    @classmethod
+    def from_payoffs(cls, payoffs, S=None):
+        payoffs = np.asarray(payoffs, dtype=float)
+        if S is None:
+            S = [list(range(size)) for size in payoffs.shape[1:]]
+        U = [(lambda w, n=n: payoffs[(n,) + tuple(int(np.argmax(row)) for row in w)]) for n in range(payoffs.shape[0])]
+        game = cls(S, U, build_tensors=False)
+        game.payoffs = payoffs
+        return game
+
+    @classmethod
+    def from_file(cls, path):
+        loaded = load_game(path)
+        return cls.from_payoffs(loaded['utilities'], loaded['strategies'])
 
 # Let x be a mixed strategy profile of the game, i.e. the same dimensionality of w except each row of x (sum over j for x[i][j]) = 1
 # A[n][i](x) = sum over all (pure) strategy plays w where w[n][i]=1(-u[n](w) * product over all other players v(not n)(x[v][j])), where j is the entry of w for player v that is 1
 # 
 # INPUTS
+# game: the Game being solved
 # x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
-# u_n: the payoff function for player n
 # n: the player to calculate utility for
 # i: the strategy of n the expectation is conditional on
 #
 # RETURNS
 # the scalar value of the opposite of the conditional expected utility for player n playing i given strategy profile x 
 ###
-def neg_conditional_expected_utility(x, u_n, n, i):
+def neg_conditional_expected_utility(game, x, n, i):
+    if game.payoffs is not None:
+        return -pure_strategy_utilities(game.payoffs, x, n)[i]
+    S, u_n = game.S, game.U[n]
     utility_sum = 0
-    for w in get_all_plays(S, n, i):
-        a = -(u_n(w))
-        other_player_product = 1
-        for v in range(len(x)):
-            if v != n:
-                j = w[v].index(1)
-                other_player_product *= x[v][j]
-        utility_sum += a * other_player_product
+    for chunk in iterate_play_indices(S, n, i):
+        for indices in chunk:
+            other_player_product = 1
+            for v, j in enumerate(indices):
+                if v != n:
+                    other_player_product *= x[v][j]
+            # plays the other players never make contribute nothing, so skip building their one-hot view
+            if other_player_product != 0:
+                utility_sum += -(u_n(one_hot_play(S, indices))) * other_player_product
     return utility_sum
 
 ###
 # INPUTS
+# game: the Game being solved
 # x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
-# u_n: the payoff function for player n
 # n: the player to calculate utility for
 #
 # RETURNS
 # the scalar value of the opposite of the conditional expected utility for player n given strategy profile x 
 ###
-def neg_expected_utility(x, u_n, n):
+def neg_expected_utility(game, x, n):
     utility_sum = 0
     # calculate sum of conditional utility times the probability of that outcome for each strategy for player n
     for i in range(len(x[n])):
-        conditional_sum = neg_conditional_expected_utility(x, u_n, n, i)
+        conditional_sum = neg_conditional_expected_utility(game, x, n, i)
         utility_sum += conditional_sum * x[n][i]
     return utility_sum
 
@@ -105,23 +207,23 @@ def normalize_strategy_profile(x):
 ###
 # INPUTS
 # S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
+# rng: the random.Random the strategies are drawn from, the global random module by default
 # 
 # RETURNS
 # x: an array of size S where exactly one element per row = 1, all else are 0
 ###
-def fix_all_strategies(S):
+def fix_all_strategies(S, rng=random):
     x = []
     for strategies in S:
         player_strategy = [0] * len(strategies)
-        random_strategy = random.choice(range(len(strategies)))
+        random_strategy = rng.choice(range(len(strategies)))
         player_strategy[random_strategy] = 1
         x.append(player_strategy)
     return x
 
 ###
 # INPUTS
-# S: the matrix of strategies for each player n, where S[n] is the list of strategies for player n
-# u_n: the payoff function for player n
+# game: the Game being solved
 # x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
 # n: the player to calculate the best response for
 #
@@ -129,9 +231,9 @@ def fix_all_strategies(S):
 # the mixed strategy profile for player n that is a best response to all x[v] for v != n 
 # result is returned as a one dimensional array of length S[n]
 ###
-def best_mixed_response(S, u_n, x, n):
-    num_strategies = len(S[n])
-    c = [neg_conditional_expected_utility(x, u_n, n, i) for i in range(num_strategies)]  # Objective function (maximize utility)
+def best_mixed_response(game, x, n):
+    num_strategies = len(game.S[n])
+    c = [neg_conditional_expected_utility(game, x, n, i) for i in range(num_strategies)]  # Objective function (maximize utility)
     # Sum of probabilities must be 1, linprog calculates in the form A_eq * x = b_eq
     A_eq = [[1] * num_strategies]
     b_eq = [1]
@@ -145,15 +247,15 @@ def best_mixed_response(S, u_n, x, n):
 
 ###
 # INPUTS
-# U: array of payoff functions for each player, array where u[n] is the payoff function for player n
+# game: the Game being solved
 # xi: the mixed strategy profile, array dimension N, each element i an array of length S[i], with the sum of each row equal to 1
 # K: the number of players to calculate alpha for, 0 if all players
 #
 # RETURNS
 # alpha: the alpha values for each player in the game to calculate x
 ###
-def calculate_alpha(U, xi, K = 0):
-    N = len(U)
+def calculate_alpha(game, xi, K = 0):
+    N = game.N
     if K == 0:
         K = N
     alpha = [0] * N
@@ -161,8 +263,8 @@ def calculate_alpha(U, xi, K = 0):
         product = 1
         for j in range(N):
             if j != i:
-                product *= neg_expected_utility(xi, U[j], j)
-        denom = neg_expected_utility(xi, U[i], i) ** (N - 2)
+                product *= neg_expected_utility(game, xi, j)
+        denom = neg_expected_utility(game, xi, i) ** (N - 2)
         alpha[i] = (product / denom) ** (1 / (N - 1))
     return alpha
 
@@ -171,16 +273,17 @@ def calculate_alpha(U, xi, K = 0):
 # according to the proof to lemma 2 on page 4 of Robert Wilson's paper
 #
 # INPUTS
+# game: the Game being solved
 # xi: the mixed strategy profile, array dimension N, each element i an array of length S[i], with the sum of each row equal to 1
 # m: the player to calculate the next initial node for
 #
 # RETURNS
 # x_bar: the next initial node
 ###
-def get_next_initial_node(xi, m):
+def get_next_initial_node(game, xi, m):
     N = m
     # First calculate the alpha values and normalize so all boundary conditions are met
-    alpha = calculate_alpha(U, xi)
+    alpha = calculate_alpha(game, xi)
     x_bar = [[element / alpha[i] if alpha[i] != 0 else element for element in row] for i, row in enumerate(xi)]
     # Then renormalize the pure strategy for player m
     pure_strategy_found = False
@@ -191,13 +294,13 @@ def get_next_initial_node(xi, m):
             x_bar[m][i] = 1
             pure_strategy_found = True
     # Then calculate the beta values and re-normalize so all boundary conditions are met except at player m's pure strategy
-    beta = min([neg_conditional_expected_utility(x_bar, U[m], m, i) for i in range(len(x_bar[m]))])
+    beta = min([neg_conditional_expected_utility(game, x_bar, m, i) for i in range(len(x_bar[m]))])
     x = [[element * (beta ** (-1/(N-1))) if i != m else element * (beta ** ((N-2)/(N-1))) for element in row] for i, row in enumerate(x_bar)]
     return x
     
 ###
 # INPUTS
-# u_n: the payoff function for player n
+# game: the Game being solved
 # x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
 # n: the player to calculate the boundary conditions for
 # i: the strategy of n to calculate the boundary conditions for
@@ -205,14 +308,14 @@ def get_next_initial_node(xi, m):
 # RETURNS
 # a dictionary with keys 'x' and 'y' and boolean values for whether the boundary conditions are satisfied for each value
 ###
-def calculate_boundary_conditions(u_n, x, n, i):
+def calculate_boundary_conditions(game, x, n, i):
     boundary_x = abs(x[n][i]) #< EPS
-    boundary_y = abs(neg_conditional_expected_utility(x, u_n, n, i) - 1) #< EPS
+    boundary_y = abs(neg_conditional_expected_utility(game, x, n, i) - 1) #< EPS
     return {'x': boundary_x, 'y': boundary_y}
 
 ###
 # INPUTS
-# U: array of payoff functions for each player, array where u[n] is the payoff function for player n
+# game: the Game being solved
 # x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
 # N: the number of players to calculate boundary conditions for (with non-fixed strategies)
 #
@@ -222,15 +325,15 @@ def calculate_boundary_conditions(u_n, x, n, i):
 # num_conditions_satisfied is the number of boundary conditions that are satisfied across all n,i,
 # complementary is a boolean that is true if the boundary conditions signal a complementary node
 ###
-def calculate_all_boundary_conditions(U, x, N):
-    K = sum(len(S[i]) for i in range(N))
+def calculate_all_boundary_conditions(game, x, N):
+    K = sum(len(game.S[i]) for i in range(N))
     boundary_conditions = []
     num_conditions_satisfied = 0
     complementary = True
     for n in range(N):
         player_conditions = []
         for i in range(len(x[n])):
-            conditions = calculate_boundary_conditions(U[n], x, n, i)
+            conditions = calculate_boundary_conditions(game, x, n, i)
             player_conditions.append(conditions)
             if conditions['x'] < EPS:
                 num_conditions_satisfied += 1
@@ -243,9 +346,87 @@ def calculate_all_boundary_conditions(U, x, N):
     complementary = complementary and num_conditions_satisfied == K
     return boundary_conditions, num_conditions_satisfied, complementary
 
+###
+# Keeps the boundary conditions of a profile current while a path step changes single coordinates x[n][i], instead of
+# recalculating every A[m][j] from scratch
+# A[m] is linear in x[n] for every m != n, so moving x[n][i] by delta moves A[m] by delta times u[m] where n plays i,
+# contracted with the other players' strategies: a rank-one correction costing O(plays / len(S[n])) per player instead of O(plays) per A[m][j]
+# A[n] itself does not depend on x[n], so only x[n][i] and the A[m] of the other players change
+#
+# INPUTS
+# game: the Game being solved
+# x: the initial mixed strategy profile, array dimension N, each element i an array of length S[i]
+# N: the number of players to track boundary conditions for (with non-fixed strategies)
+#
+# ATTRIBUTES
+# x: the current profile, one numpy array per player
+# A: A[n][i] = neg_conditional_expected_utility(game, x, n, i) for every n < N
+# boundary_conditions, num_conditions_satisfied: as returned by calculate_all_boundary_conditions
+# num_both_satisfied: the number of n, i with both x[n][i] and y[n][i] within epsilon of 0, the node is only complementary if there are none
+###
+class BoundaryTracker:
+    def __init__(self, game, x, N):
+        self.game = game
+        self.N = N
+        self.K = sum(len(game.S[i]) for i in range(N))
+        self.x = [np.array(row, dtype=float) for row in x]
+        self.boundary_conditions = [[None] * len(self.x[n]) for n in range(N)]
+        self.num_conditions_satisfied = 0
+        self.num_both_satisfied = 0
+        self.refresh()
+
+    # recalculates every A[n][i] from scratch, e.g. to clear rounding accumulated over many updates
+    def refresh(self):
+        self.A = [np.array([neg_conditional_expected_utility(self.game, self.x, n, i) for i in range(len(self.x[n]))]) for n in range(self.N)]
+        for n in range(self.N):
+            for i in range(len(self.x[n])):
+                self.set_conditions(n, i)
+
+    def set_conditions(self, n, i):
+        if self.boundary_conditions[n][i] is not None:
+            self.count_conditions(self.boundary_conditions[n][i], -1)
+        conditions = {'x': abs(self.x[n][i]), 'y': abs(self.A[n][i] - 1)}
+        self.boundary_conditions[n][i] = conditions
+        self.count_conditions(conditions, 1)
+
+    def count_conditions(self, conditions, sign):
+        satisfied_x, satisfied_y = conditions['x'] < EPS, conditions['y'] < EPS
+        self.num_conditions_satisfied += sign * (int(satisfied_x) + int(satisfied_y))
+        self.num_both_satisfied += sign * int(satisfied_x and satisfied_y)
+
+    @property
+    def complementary(self):
+        return self.num_both_satisfied == 0 and self.num_conditions_satisfied == self.K
+
+    # sets x[n][i] to value and updates every boundary condition it changes
+    def update(self, n, i, value):
+        delta = value - self.x[n][i]
+        self.x[n][i] = value
+        if n < self.N:
+            self.set_conditions(n, i)
+        for m in range(self.N):
+            if m == n:
+                continue
+            if self.game.payoffs is not None:
+                utilities = np.take(self.game.payoffs[m], i, axis=n)
+                # contract the other players' axes from the last to the first, axes after n moved down by one when n's was taken
+                for v in reversed(range(len(self.x))):
+                    if v != n and v != m:
+                        utilities = np.tensordot(utilities, self.x[v], axes=([v if v < n else v - 1], [0]))
+                self.A[m] -= delta * utilities
+            else:
+                self.A[m] = np.array([neg_conditional_expected_utility(self.game, self.x, m, j) for j in range(len(self.x[m]))])
+            for j in range(len(self.x[m])):
+                self.set_conditions(m, j)
+
+    # RETURNS the same [boundary_conditions, num_conditions_satisfied, complementary] as calculate_all_boundary_conditions
+    def get_conditions(self):
+        return self.boundary_conditions, self.num_conditions_satisfied, self.complementary
+
 
 ### Problem Definition
 # INPUTS
+# game: the Game to solve, which holds
 # N: number of players
 # S: list of pure strategies for each player, array where S[n] is the list of strategies for player n
 # U: array of payoff functions for each player, array where u[n] is the payoff function for player n
@@ -272,9 +453,22 @@ def calculate_all_boundary_conditions(U, x, N):
 # QUESTIONS
 # do you only vary x[n][i] positive? How does any x[n][i] become 0 then?
 ###
-def calculate_nash_equilibrium(N, S, U):
+def calculate_nash_equilibrium(game):
     # Nash equilibrium for an N-person game following the strategy of Robert Wilson
+    N, S = game.N, game.S
     print("Calculating Nash Equilibrium...")
+    # 2 player constant-sum games are solved exactly by one small minimax LP per player
+    if game.payoffs is not None:
+        minimax = solve_zero_sum(game.payoffs)
+        if minimax is not None:
+            x = [row.tolist() for row in minimax['x']]
+            print("constant-sum game, minimax strategies", x, "values", minimax['values'])
+            return x
+        # a scan of every player's best responses finds any pure equilibrium directly
+        pure = solve_pure(game.payoffs)
+        if pure['x'] is not None:
+            print("pure equilibrium", pure['x'], "potential game" if pure['potential'] is not None else "")
+            return pure['x']
     # Fix all strategies randomly for n >= 1
     x = [[1, .000, .000], [0, 1, .000], [.000, 1, 0]]#fix_all_strategies(S) #
     print("initial randomized strategies", x)
@@ -288,10 +482,12 @@ def calculate_nash_equilibrium(N, S, U):
     # x = [[element / alpha[i] if alpha[i] != 0 else element for element in row] for i, row in enumerate(x)]
     # print("x", x)
 
-    x = get_next_initial_node(initial_node, 1)
+    x = get_next_initial_node(game, initial_node, 1)
     print("x", x)
 
-    boundary_conditions, num_conditions_satisfied, complementary = calculate_all_boundary_conditions(U, x, N)
+    # path steps update single coordinates with tracker.update, which keeps the conditions current
+    tracker = BoundaryTracker(game, x, N)
+    boundary_conditions, num_conditions_satisfied, complementary = tracker.get_conditions()
     print("boundary condition\n" + format_boundary_conditions(boundary_conditions))
     print("num conditions satisfied", num_conditions_satisfied)
     print("complementary", complementary)
@@ -314,7 +510,7 @@ def calculate_nash_equilibrium(N, S, U):
         break
 
     for i in range(N):
-        print("- utility expectation for player", i, neg_expected_utility(x, U[i], i))
+        print("- utility expectation for player", i, neg_expected_utility(game, x, i))
 
 def two_player_utility(n):
     m = 0 if n == 1 else 1
@@ -337,14 +533,12 @@ if __name__ == "__main__":
     print("2 player example")
     S = [[0, 1], [0, 1]]
     U = [two_player_utility(0), two_player_utility(1)]
-    assert(len(S) == len(U))
-    N = len(S)
-    #calculate_nash_equilibrium(N, S, U)
+    game = Game(S, U)
+    #calculate_nash_equilibrium(game)
 
     # rock paper scissors example
     print("\n\nrock paper scissors example")
     S = [[0, 1, 2], [0, 1, 2], [0, 1, 2]]
     U = [rock_paper_scissors_utility(0), rock_paper_scissors_utility(1), rock_paper_scissors_utility(2)]
-    assert(len(S) == len(U))
-    N = len(S)
-    calculate_nash_equilibrium(N, S, U)
+    game = Game(S, U)
+    calculate_nash_equilibrium(game)
@@ -0,0 +1,128 @@
+import random
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from scipy.optimize import minimize
+from main import Game, fix_all_strategies, build_payoff_tensor, pure_strategy_utilities
+from normal_form.zero_sum import solve_zero_sum
+from normal_form.pure_equilibria import solve_pure
+
+###
+# INPUTS
+# payoffs: the payoff tensor from build_payoff_tensor
+# x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
+#
+# RETURNS
+# the Liapunov function of x, the sum over all n, i of the squared gain max(0, u[n](i, x_-n) - u[n](x))
+# it is 0 exactly at Nash equilibria
+###
+def nash_regret(payoffs, x):
+    regret = 0
+    for n in range(len(x)):
+        utilities = pure_strategy_utilities(payoffs, x, n)
+        regret += np.sum(np.maximum(utilities - np.dot(x[n], utilities), 0) ** 2)
+    return regret
+
+###
+# INPUTS
+# payoffs: the payoff tensor from build_payoff_tensor
+# x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
+#
+# RETURNS
+# the gradient of nash_regret with respect to every x[m][k], as a flat array in player order
+###
+def nash_regret_gradient(payoffs, x):
+    gradient = [np.zeros(len(row)) for row in x]
+    for n in range(len(x)):
+        utilities = pure_strategy_utilities(payoffs, x, n)
+        gains = np.maximum(utilities - np.dot(x[n], utilities), 0)
+        gradient[n] -= 2 * np.sum(gains) * utilities
+        for m in range(len(x)):
+            if m == n:
+                continue
+            # cross[i][k] is the expected utility for n playing i when m plays k and the rest play x
+            cross = payoffs[n]
+            for v in reversed(range(len(x))):
+                if v != n and v != m:
+                    cross = np.tensordot(cross, x[v], axes=([v], [0]))
+            if m < n:
+                cross = cross.T
+            gradient[m] += 2 * (gains @ cross - np.sum(gains) * (x[n] @ cross))
+    return np.concatenate(gradient)
+
+###
+# INPUTS
+# payoffs: the payoff tensor from build_payoff_tensor
+# seed: the random seed for this run's initial pure profile and perturbation
+# tolerance: the largest Liapunov value accepted as an equilibrium
+# perturbation: the probability mass spread randomly off the initial pure profile so the descent can leave its vertex
+#
+# RETURNS
+# a dictionary with the seed, the final mixed strategy profile x, its Liapunov value, whether it converged, and the run time in seconds
+###
+def run_from_seed(payoffs, seed, tolerance=1e-10, perturbation=0.1):
+    start = time.perf_counter()
+    # local generators, so runs in this process leave the caller's random state alone
+    pure_rng, rng = random.Random(seed), np.random.default_rng(seed)
+    S = [list(range(size)) for size in payoffs.shape[1:]]
+    sizes = [len(strategies) for strategies in S]
+    offsets = np.cumsum([0] + sizes)
+    # start at the randomized pure profile, mixed slightly towards a random interior point
+    x0 = np.concatenate([(1 - perturbation) * np.array(row) + perturbation * rng.dirichlet(np.ones(len(row))) for row in fix_all_strategies(S, pure_rng)])
+    unflatten = lambda flat: [flat[offsets[n]:offsets[n + 1]] for n in range(len(S))]
+    constraints = [{'type': 'eq', 'fun': (lambda flat, n=n: np.sum(flat[offsets[n]:offsets[n + 1]]) - 1)} for n in range(len(S))]
+    result = minimize(lambda flat: nash_regret(payoffs, unflatten(flat)), x0, jac=lambda flat: nash_regret_gradient(payoffs, unflatten(flat)),
+                      method='SLSQP', bounds=[(0, 1)] * len(x0), constraints=constraints, options={'ftol': tolerance * 1e-2, 'maxiter': 1000})
+    x = [(row / np.sum(row)).tolist() for row in unflatten(np.clip(result.x, 0, 1))]
+    regret = nash_regret(payoffs, x)
+    return {'seed': seed, 'x': x, 'regret': regret, 'converged': regret <= tolerance, 'seconds': time.perf_counter() - start}
+
+###
+# INPUTS
+# equilibria: a list of mixed strategy profiles
+# tolerance: the largest difference in any x[n][i] for two profiles to be considered the same equilibrium
+#
+# RETURNS
+# the list of distinct profiles, keeping the first found of each
+###
+def deduplicate_equilibria(equilibria, tolerance=1e-4):
+    distinct = []
+    for x in equilibria:
+        flat = np.concatenate(x)
+        if all(np.max(np.abs(flat - np.concatenate(y))) > tolerance for y in distinct):
+            distinct.append(x)
+    return distinct
+
+###
+# INPUTS
+# payoffs: the payoff tensor from build_payoff_tensor, or a Game, whose tensor is built if it was made with build_tensors=False
+# num_runs: the number of independent runs, each from its own random initial pure profile
+# seed: the seed the run seeds are derived from
+# max_workers: the number of worker processes, None for one per CPU and 1 to run serially in this process
+# tolerance: the largest Liapunov value accepted as an equilibrium
+# dedup_tolerance: the largest difference in any x[n][i] for two equilibria to be considered the same
+# pure_first: whether to skip the runs when the game has pure equilibria and return only those
+#
+# RETURNS
+# a dictionary with the distinct equilibria found and the per run results (seed, x, regret, converged, seconds)
+# 2 player constant-sum games skip the runs and return their minimax profile as the only equilibrium
+###
+def multi_start_nash(payoffs, num_runs=32, seed=0, max_workers=None, tolerance=1e-10, dedup_tolerance=1e-4, pure_first=False):
+    if isinstance(payoffs, Game):
+        # every run needs the tensor, so a streamed game is tabulated once here
+        payoffs = payoffs.payoffs if payoffs.payoffs is not None else build_payoff_tensor(payoffs.S, payoffs.U)
+    minimax = solve_zero_sum(payoffs)
+    if minimax is not None:
+        return {'equilibria': [[row.tolist() for row in minimax['x']]], 'runs': []}
+    if pure_first:
+        pure = solve_pure(payoffs)
+        if len(pure['equilibria']):
+            return {'equilibria': [[np.eye(size)[i].tolist() for size, i in zip(payoffs.shape[1:], play)] for play in pure['equilibria']], 'runs': []}
+    seeds = [seed * num_runs + run for run in range(num_runs)]
+    if max_workers == 1:
+        runs = [run_from_seed(payoffs, run_seed, tolerance) for run_seed in seeds]
+    else:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            runs = list(executor.map(run_from_seed, [payoffs] * num_runs, seeds, [tolerance] * num_runs))
+    equilibria = deduplicate_equilibria([run['x'] for run in runs if run['converged']], dedup_tolerance)
+    return {'equilibria': equilibria, 'runs': runs}
@@ -1,4 +1,14 @@
+import os
+import sys
+# the shared normal_form package lives at the repo root, so running the tests from this directory needs it on the path
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 from main import *
+from multistart import *
+from normal_form.zero_sum import *
+from normal_form.pure_equilibria import *
+from normal_form.game_loader import *
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
 ### Testing file for main.py
 make_array_tuple = lambda x: tuple(map(tuple, x))
 format_array = lambda x: "\n".join(map(lambda y: str(y), x))
@@ -37,12 +47,292 @@ def test_get_all_plays():
         return False, "Error with 4 players, 1-4 variable plays each, n,i = (3,1)\nexpected: " + format_array(expected) + "\nactual: " + format_array(all_plays)
     return True, None
 
+### Tests for iterate_play_indices
+# partition:
+# chunk_size divides the number of plays, chunk_size does not divide the number of plays
+# one_hot_play of every index tuple matches get_all_plays
+###
+def test_iterate_play_indices():
+    S = [[0], [0, 1, 2], [0, 1, 2, 3], [0, 1]]
+    chunks = list(iterate_play_indices(S, 3, 1, chunk_size=5))
+    if [len(chunk) for chunk in chunks] != [5, 5, 2]:
+        return False, "Error with chunking 12 plays into chunks of 5\nactual: " + str([len(chunk) for chunk in chunks])
+    indices = [play for chunk in chunks for play in chunk]
+    if any(play[3] != 1 for play in indices):
+        return False, "Error with fixed strategy, every play should have player 3 playing 1\nactual: " + str(indices)
+    one_hot = [one_hot_play(S, play) for play in indices]
+    if set(map(make_array_tuple, one_hot)) != set(map(make_array_tuple, get_all_plays(S, 3, 1))):
+        return False, "Error with one hot views\nexpected: " + format_array(get_all_plays(S, 3, 1)) + "\nactual: " + format_array(one_hot)
+    return True, None
+
+### Tests for Game
+# partition:
+# payoffs as tensors, payoffs as streamed callables
+# solved serially, solved concurrently in threads with another game
+###
+def test_game():
+    rps = Game([[0, 1, 2], [0, 1, 2], [0, 1, 2]], [rock_paper_scissors_utility(n) for n in range(3)])
+    streamed = Game(rps.S, rps.U, build_tensors=False)
+    coordination = Game([[0, 1], [0, 1]], [two_player_utility(0), two_player_utility(1)])
+    x = [[0.2, 0.3, 0.5], [0.6, 0.1, 0.3], [0.25, 0.25, 0.5]]
+    for n in range(3):
+        for i in range(3):
+            if abs(neg_conditional_expected_utility(rps, x, n, i) - neg_conditional_expected_utility(streamed, x, n, i)) > 1e-9:
+                return False, "Error with payoff tensor, conditional utility differs from streamed callables for n,i = " + str((n, i))
+    # two independent games solved at the same time must not see each other's strategies or payoffs
+    jobs = [(rps, x, 0), (coordination, [[0.5, 0.5], [0.1, 0.9]], 1)] * 8
+    expected = [best_mixed_response(game, x_job, n).tolist() for game, x_job, n in jobs]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        actual = list(executor.map(lambda job: best_mixed_response(*job).tolist(), jobs))
+    if actual != expected:
+        return False, "Error with concurrent solves\nexpected: " + format_array(expected) + "\nactual: " + format_array(actual)
+    return True, None
+
+### Tests for multi_start_nash
+# partition:
+# game with several pure equilibria, game with a unique mixed equilibrium
+# runs in a process pool, runs serially
+# caller's global random state
+###
+def test_multi_start_nash():
+    # coordination game with pure equilibria at (0, 0) and (1, 1) and a mixed one at (2/3, 1/3)
+    payoffs = np.array([[[2, 0], [0, 1]], [[2, 0], [0, 1]]], dtype=float)
+    result = multi_start_nash(payoffs, num_runs=16, max_workers=2)
+    found = [tuple(int(round(row[0])) for row in x) for x in result['equilibria']]
+    if (1, 1) not in found or (0, 0) not in found:
+        return False, "Error with coordination game, both pure equilibria should be found\nactual: " + str(result['equilibria'])
+    if len(result['runs']) != 16 or any(run['seconds'] <= 0 for run in result['runs']):
+        return False, "Error with coordination game, every run should report its timing"
+    if any(nash_regret(payoffs, x) > 1e-10 for x in result['equilibria']):
+        return False, "Error with coordination game, returned profile is not an equilibrium"
+    # serial runs must not reseed the caller's global random state
+    random.seed(1)
+    expected = random.random()
+    random.seed(1)
+    multi_start_nash(payoffs, num_runs=2, max_workers=1)
+    if random.random() != expected or run_from_seed(payoffs, 3)['x'] != run_from_seed(payoffs, 3)['x']:
+        return False, "Error with coordination game, runs should use their own seeded generators"
+    # rock paper scissors only has the uniform equilibrium, so every converged run should collapse to one profile
+    S = [[0, 1, 2], [0, 1, 2], [0, 1, 2]]
+    payoffs = build_payoff_tensor(S, [rock_paper_scissors_utility(n) for n in range(3)])
+    result = multi_start_nash(payoffs, num_runs=4, max_workers=1)
+    if len(result['equilibria']) != 1 or np.max(np.abs(np.array(result['equilibria'][0]) - 1 / 3)) > 1e-3:
+        return False, "Error with rock paper scissors, expected only the uniform equilibrium\nactual: " + str(result['equilibria'])
+    return True, None
+
+### Tests for solve_zero_sum
+# partition:
+# zero-sum, constant-sum != 0, not constant-sum
+# 2 players, more than 2 players
+# unique pure minimax, mixed minimax, players with different numbers of strategies
+# Game with tensors built, Game with build_tensors=False
+###
+def test_solve_zero_sum():
+    # matching pennies has the uniform minimax profile and value 0
+    payoffs = np.array([[[1, -1], [-1, 1]], [[-1, 1], [1, -1]]], dtype=float)
+    result = solve_zero_sum(payoffs)
+    if result is None or np.max(np.abs(np.array(result['x']) - 0.5)) > 1e-9 or abs(result['values'][0]) > 1e-9:
+        return False, "Error with matching pennies\nactual: " + str(result)
+    # 2 player rock paper scissors sums to -3 on every play
+    S = [[0, 1, 2], [0, 1, 2]]
+    payoffs = build_payoff_tensor(S, [rock_paper_scissors_utility(n) for n in range(2)])
+    result = solve_zero_sum(payoffs)
+    if result is None or abs(result['constant'] + 3) > 1e-9 or np.max(np.abs(np.array(result['x']) - 1 / 3)) > 1e-9:
+        return False, "Error with rock paper scissors, expected the uniform profile\nactual: " + str(result)
+    if abs(result['values'][0] + 1.5) > 1e-9 or result['exploitability'] > 1e-9:
+        return False, "Error with rock paper scissors, expected value -1.5 and no exploitability\nactual: " + str(result)
+    if multi_start_nash(Game(S, [rock_paper_scissors_utility(n) for n in range(2)], build_tensors=False))['equilibria'] != [[row.tolist() for row in result['x']]]:
+        return False, "Error with rock paper scissors, a streamed Game should be tabulated for multi_start_nash"
+    if multi_start_nash(payoffs)['runs'] != [] or calculate_nash_equilibrium(Game(S, [rock_paper_scissors_utility(n) for n in range(2)])) != [row.tolist() for row in result['x']]:
+        return False, "Error with rock paper scissors, Nash entry points should use the minimax profile"
+    # saddle point at (1, 0) with 2 strategies against 3
+    payoffs = np.array([[[3, 1, 4], [5, 2, 6]], [[-3, -1, -4], [-5, -2, -6]]], dtype=float)
+    result = solve_zero_sum(payoffs)
+    if result is None or not np.allclose(result['x'][0], [0, 1]) or not np.allclose(result['x'][1], [0, 1, 0]) or abs(result['values'][0] - 2) > 1e-9:
+        return False, "Error with saddle point game\nactual: " + str(result)
+    # the coordination game and 3 player rock paper scissors are not routed
+    if solve_zero_sum(np.array([[[2, 0], [0, 1]], [[2, 0], [0, 1]]], dtype=float)) is not None:
+        return False, "Error with coordination game, it is not constant-sum"
+    S = [[0, 1, 2], [0, 1, 2], [0, 1, 2]]
+    payoffs = build_payoff_tensor(S, [rock_paper_scissors_utility(n) for n in range(3)])
+    if find_constant_sum(payoffs) is None or solve_zero_sum(payoffs) is not None:
+        return False, "Error with 3 player rock paper scissors, it is constant-sum but has no minimax LP"
+    if np.max(deviation_gains(payoffs, [np.full(3, 1 / 3)] * 3)) > 1e-12:
+        return False, "Error with deviation gains, the uniform profile is an equilibrium of rock paper scissors"
+    return True, None
+
+### Tests for solve_pure
+# partition:
+# no pure equilibrium, one, several
+# exact potential game, not a potential game
+# 2 players, more than 2 players, players with different numbers of strategies
+###
+def test_solve_pure():
+    # matching pennies has no pure equilibrium and no potential
+    result = solve_pure(np.array([[[1, -1], [-1, 1]], [[-1, 1], [1, -1]]], dtype=float))
+    if len(result['equilibria']) != 0 or result['potential'] is not None or result['x'] is not None:
+        return False, "Error with matching pennies, expected no pure equilibrium\nactual: " + str(result)
+    # the coordination game is its own potential, best at (0, 0)
+    payoffs = np.array([[[2, 0], [0, 1]], [[2, 0], [0, 1]]], dtype=float)
+    result = solve_pure(payoffs)
+    if make_array_tuple(result['equilibria']) != ((0, 0), (1, 1)) or result['x'] != [[1, 0], [1, 0]]:
+        return False, "Error with coordination game\nactual: " + str(result)
+    if multi_start_nash(payoffs, pure_first=True) != {'equilibria': [[[1, 0], [1, 0]], [[0, 1], [0, 1]]], 'runs': []}:
+        return False, "Error with coordination game, pure_first should return the pure equilibria without runs"
+    # the prisoner's dilemma is dominance solvable and a potential game
+    S = [[0, 1], [0, 1]]
+    U = [lambda w: [[3, 0], [5, 1]][w[0].index(1)][w[1].index(1)], lambda w: [[3, 5], [0, 1]][w[0].index(1)][w[1].index(1)]]
+    if calculate_nash_equilibrium(Game(S, U)) != [[0, 1], [0, 1]]:
+        return False, "Error with prisoner's dilemma, expected (1, 1)"
+    # a 2 x 3 x 4 potential game plus payoffs each player cannot affect
+    rng = np.random.default_rng(0)
+    potential = rng.normal(size=(2, 3, 4))
+    payoffs = np.stack([potential + rng.normal(size=(1, 3, 4)), potential + rng.normal(size=(2, 1, 4)), potential + rng.normal(size=(2, 3, 1))])
+    result = solve_pure(payoffs)
+    if result['potential'] is None or np.max(np.abs(result['potential'] - potential - (result['potential'] - potential).flat[0])) > 1e-9:
+        return False, "Error with potential game, potential not recovered"
+    best = np.unravel_index(np.argmax(potential), potential.shape)
+    if result['x'] != [np.eye(size)[best[n]].tolist() for n, size in enumerate(potential.shape)] or not any((row == best).all() for row in result['equilibria']):
+        return False, "Error with potential game, the potential maximum should be an equilibrium\nactual: " + str(result['x'])
+    payoffs[0, 0, 0, 0] += 1
+    if find_potential(payoffs) is not None:
+        return False, "Error with potential game, a perturbed game should not have a potential"
+    # every listed equilibrium should have no profitable deviation
+    payoffs = rng.normal(size=(3, 3, 3, 3)).round()
+    for play in find_pure_equilibria(payoffs):
+        x = [np.eye(3)[i] for i in play]
+        if np.max(deviation_gains(payoffs, x)) > 1e-12:
+            return False, "Error with random game, " + str(play) + " is not an equilibrium"
+    return True, None
+
+### Tests for load_game
+# partition:
+# payoff format, outcome format, npz with one tensor, npz with one array per player
+# counted strategies, named strategies, players with different numbers of strategies
+# integer, decimal and rational payoffs
+# chunks larger than the file, chunks splitting tokens
+###
+def test_load_game():
+    directory = tempfile.mkdtemp()
+    payoff_path = os.path.join(directory, "selten.nfg")
+    with open(payoff_path, "w") as file:
+        file.write('NFG 1 R "Selten (IJGT, 75), Figure 2, normal form"\n{ "Player 1" "Player 2" } { 3 2 }\n\n1 1 0 2 0 2 1 1 0 3 2 1/2\n')
+    expected = np.array([[[1, 1], [0, 0], [0, 2]], [[1, 1], [2, 3], [2, 0.5]]])
+    for chunk_size in [CHUNK_SIZE, 3]:
+        loaded = load_nfg(payoff_path, chunk_size)
+        if loaded['players'] != ["Player 1", "Player 2"] or loaded['strategies'] != [["1", "2", "3"], ["1", "2"]]:
+            return False, "Error with payoff format header\nactual: " + str(loaded)
+        if not np.array_equal(loaded['utilities'], expected):
+            return False, "Error with payoff format, chunk size " + str(chunk_size) + "\nactual: " + str(loaded['utilities'])
+    outcome_path = os.path.join(directory, "pennies.nfg")
+    with open(outcome_path, "w") as file:
+        file.write('NFG 1 R "Matching pennies" { "P1" "P2" }\n{ { "heads" "tails" } { "heads" "tails" } }\n""\n{\n{ "" 1, -1 }\n{ "" -1.5, 1 }\n}\n1 2 2 0\n')
+    loaded = load_nfg(outcome_path, 5)
+    if loaded['strategies'] != [["heads", "tails"], ["heads", "tails"]] or not np.array_equal(loaded['utilities'], [[[1, -1.5], [-1.5, 0]], [[-1, 1], [1, 0]]]):
+        return False, "Error with outcome format\nactual: " + str(loaded)
+    with open(os.path.join(directory, "short.nfg"), "w") as file:
+        file.write('NFG 1 R "" { "1" "2" } { 2 2 } 1 2 3')
+    try:
+        load_game(os.path.join(directory, "short.nfg"))
+        return False, "Error with payoff format, a file with too few payoffs should be rejected"
+    except ValueError:
+        pass
+    # npz archives with one tensor or with one array per player
+    S = [[0, 1, 2], [0, 1, 2]]
+    payoffs = build_payoff_tensor(S, [rock_paper_scissors_utility(n) for n in range(2)])
+    np.savez(os.path.join(directory, "tensor.npz"), utilities=payoffs)
+    np.savez(os.path.join(directory, "players.npz"), payoffs[0], payoffs[1], players=np.array(["row", "column"]))
+    for name, players in [("tensor.npz", ["1", "2"]), ("players.npz", ["row", "column"])]:
+        loaded = load_game(os.path.join(directory, name))
+        if loaded['players'] != players or not np.array_equal(loaded['utilities'], payoffs):
+            return False, "Error with " + name + "\nactual: " + str(loaded)
+    # games from files solve like games built from payoff functions
+    game = Game.from_file(os.path.join(directory, "tensor.npz"))
+    x = [[1 / 3] * 3, [1 / 3] * 3]
+    if abs(neg_conditional_expected_utility(game, x, 0, 1) - neg_conditional_expected_utility(Game(S, [rock_paper_scissors_utility(n) for n in range(2)]), x, 0, 1)) > 1e-12:
+        return False, "Error with Game.from_file, conditional expected utility does not match"
+    game = Game.from_file(payoff_path)
+    if game.U[1]([[0, 0, 1], [0, 1]]) != 0.5 or game.payoffs.shape != (2, 3, 2):
+        return False, "Error with Game.from_file, payoff functions should look up the loaded tensor"
+    return True, None
+
+### Tests for BoundaryTracker
+# partition:
+# payoff tensor, streamed payoff functions
+# change of a tracked player, change of an untracked (fixed) player
+# a coordinate moving onto a boundary, moving off it
+###
+def test_boundary_tracker():
+    rng = np.random.default_rng(0)
+    S = [[0, 1], [0, 1, 2], [0, 1]]
+    payoffs = rng.normal(size=(3, 2, 3, 2))
+    U = [(lambda w, n=n: payoffs[(n,) + tuple(row.index(1) for row in w)]) for n in range(3)]
+    for game in [Game(S, U), Game(S, U, build_tensors=False)]:
+        x = [rng.dirichlet(np.ones(len(strategies))).tolist() for strategies in S]
+        tracker = BoundaryTracker(game, x, 2)
+        for n, i, value in [(0, 1, 0.0), (2, 0, 0.25), (1, 2, 0.5), (1, 2, 0.0), (0, 1, 0.3)]:
+            tracker.update(n, i, value)
+            x[n][i] = value
+            expected = calculate_all_boundary_conditions(game, x, 2)
+            actual = tracker.get_conditions()
+            for m in range(2):
+                for j in range(len(S[m])):
+                    for key in ['x', 'y']:
+                        if abs(actual[0][m][j][key] - expected[0][m][j][key]) > 1e-9:
+                            return False, "Error with update of x[" + str(n) + "][" + str(i) + "], boundary " + key + " of " + str((m, j)) + " is stale"
+            if actual[1:] != expected[1:]:
+                return False, "Error with update of x[" + str(n) + "][" + str(i) + "]\nexpected: " + str(expected[1:]) + "\nactual: " + str(actual[1:])
+    # moving player 1 onto a pure strategy reaches a complementary node: y[n][0] from A[n][0] = 1 and x[n][1] from the zeros
+    payoffs = np.array([[[-1, -2], [-3, -4]], [[-1, -3], [-2, -4]]], dtype=float)
+    game = Game.from_payoffs(payoffs)
+    tracker = BoundaryTracker(game, [[1, 0], [0.5, 0.5]], 2)
+    tracker.update(1, 0, 1)
+    tracker.update(1, 1, 0)
+    if tracker.get_conditions()[1:] != calculate_all_boundary_conditions(game, [[1, 0], [1, 0]], 2)[1:] or tracker.get_conditions()[1:] != (4, True):
+        return False, "Error with node, expected a complementary node with 4 satisfied conditions\nactual: " + str(tracker.get_conditions())
+    return True, None
+
 def run_all_tests():
     [all_plays, error] = test_get_all_plays()
     if not all_plays:
         print("Error with get all plays: ", error)
     else:
         print("get all plays tests passed")
+    [play_indices, error] = test_iterate_play_indices()
+    if not play_indices:
+        print("Error with iterate play indices: ", error)
+    else:
+        print("iterate play indices tests passed")
+    [game, error] = test_game()
+    if not game:
+        print("Error with game: ", error)
+    else:
+        print("game tests passed")
+    [multi_start, error] = test_multi_start_nash()
+    if not multi_start:
+        print("Error with multi start nash: ", error)
+    else:
+        print("multi start nash tests passed")
+    [zero_sum, error] = test_solve_zero_sum()
+    if not zero_sum:
+        print("Error with solve zero sum: ", error)
+    else:
+        print("solve zero sum tests passed")
+    [pure, error] = test_solve_pure()
+    if not pure:
+        print("Error with solve pure: ", error)
+    else:
+        print("solve pure tests passed")
+    [loader, error] = test_load_game()
+    if not loader:
+        print("Error with load game: ", error)
+    else:
+        print("load game tests passed")
+    [tracker, error] = test_boundary_tracker()
+    if not tracker:
+        print("Error with boundary tracker: ", error)
+    else:
+        print("boundary tracker tests passed")
 
 if __name__ == "__main__":
     run_all_tests()
\ No newline at end of file
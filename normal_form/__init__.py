@@ -0,0 +1 @@
+# normal form game building blocks shared by the Nash solvers in nash/ and the correlated equilibrium engines in correlated/
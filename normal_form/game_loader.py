@@ -0,0 +1,211 @@
+# loads Gambit .nfg and NumPy .npz games into a preallocated payoff tensor
+import re
+import numpy as np
+from fractions import Fraction
+
+TOKEN = re.compile(r'"(?:[^"\\]|\\.)*"|[{},]|[^\s{},"]+|"')
+CHUNK_SIZE = 1 << 20
+
+###
+# Reads the tokens of a Gambit .nfg file one at a time for the header, then hands the rest of the file over in large chunks of
+# whitespace separated numbers, so the payoffs never go through per token Python code
+#
+# INPUTS
+# file: a text file object positioned at the start of the file
+# chunk_size: the number of characters read at a time
+###
+class Nfg_reader:
+    def __init__(self, file, chunk_size=CHUNK_SIZE):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.position = 0
+        self.eof = False
+
+    def next_token(self):
+        while True:
+            match = TOKEN.search(self.text, self.position)
+            # a token touching the end of the buffer may continue in the next chunk
+            if match and (self.eof or (match.end() < len(self.text) and match.group() != '"')):
+                self.position = match.end()
+                if match.group() == '"':
+                    raise ValueError("Unterminated string in game file")
+                return match.group()
+            if self.eof:
+                return None
+            chunk = self.file.read(self.chunk_size)
+            self.eof = not chunk
+            self.text = self.text[self.position:] + chunk
+            self.position = 0
+
+    def expect(self, expected):
+        token = self.next_token()
+        if token != expected:
+            raise ValueError("Malformed game file, expected " + expected + " but found", token)
+
+    def read_list(self):
+        # the tokens of a { ... } list whose opening brace was already read, nested lists are returned as lists
+        items = []
+        while True:
+            token = self.next_token()
+            if token is None:
+                raise ValueError("Malformed game file, unterminated list")
+            if token == "}":
+                return items
+            if token == "{":
+                items.append(self.read_list())
+            elif token != ",":
+                items.append(token)
+
+    def number_chunks(self):
+        # yields arrays of the numbers in the rest of the file, cutting each chunk after its last whitespace
+        text = self.text[self.position:]
+        while True:
+            chunk = "" if self.eof else self.file.read(self.chunk_size)
+            self.eof = not chunk
+            text += chunk
+            cut = len(text) if self.eof else max(text.rfind(" "), text.rfind("\n"), text.rfind("\t"), text.rfind("\r")) + 1
+            if cut > 0:
+                yield parse_numbers(text[:cut])
+                text = text[cut:]
+            if self.eof:
+                return
+
+###
+# INPUTS
+# text: whitespace separated decimal or rational numbers such as 1/2
+#
+# RETURNS
+# an array of the numbers as floats
+###
+def parse_numbers(text):
+    tokens = text.split()
+    try:
+        return np.array(tokens, dtype=float)
+    except ValueError:
+        return np.array([float(Fraction(token)) for token in tokens], dtype=float)
+
+###
+# INPUTS
+# shape: the number of strategies of each player
+# profiles: indices of plays in Gambit order, where the first player's strategy changes fastest
+#
+# RETURNS
+# the indices of the same plays in C order, where the last player's strategy changes fastest, as in the payoff tensor
+###
+def gambit_to_c_order(shape, profiles):
+    indices = np.zeros(len(profiles), dtype=np.int64)
+    gambit_stride, c_stride = 1, int(np.prod(shape))
+    for size in shape:
+        c_stride //= size
+        indices += (profiles // gambit_stride) % size * c_stride
+        gambit_stride *= size
+    return indices
+
+###
+# INPUTS
+# path: a Gambit .nfg file in either the payoff format, a list of every player's payoff for each play, or the outcome format,
+#   a table of outcomes followed by the outcome of each play
+# chunk_size: the number of characters read at a time
+#
+# RETURNS
+# a dictionary with the player names, the strategy names of each player and the payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# the tensor is allocated once and every chunk of payoffs is written straight to its place in it
+###
+def load_nfg(path, chunk_size=CHUNK_SIZE):
+    with open(path) as file:
+        reader = Nfg_reader(file, chunk_size)
+        reader.expect("NFG")
+        reader.expect("1")
+        if reader.next_token() not in ("R", "D"):
+            raise ValueError("Malformed game file, expected R or D after the version")
+        reader.next_token()  # title
+        reader.expect("{")
+        players = [name.strip('"') for name in reader.read_list()]
+        reader.expect("{")
+        strategies = [[name.strip('"') for name in entry] if isinstance(entry, list) else [str(i + 1) for i in range(int(entry))]
+                      for entry in reader.read_list()]
+        if len(strategies) != len(players):
+            raise ValueError("Game file lists strategies for", len(strategies), "players, expected", len(players))
+        shape = tuple(len(names) for names in strategies)
+        N, num_profiles = len(players), int(np.prod(shape))
+        utilities = np.empty((N,) + shape)
+        flat = utilities.reshape(-1)
+
+        token = reader.next_token()
+        if token is not None and token.startswith('"'):
+            token = reader.next_token()  # comment
+        count = 0
+        if token == "{":
+            # outcome format: outcome 0 pays nothing, the others are listed in order
+            outcomes = [np.zeros(N)]
+            for outcome in reader.read_list():
+                payoffs = [value for value in outcome if not value.startswith('"')]
+                if len(payoffs) != N:
+                    raise ValueError("Outcome has", len(payoffs), "payoffs, expected", N)
+                outcomes.append(parse_numbers(" ".join(payoffs)))
+            outcomes = np.array(outcomes)
+            for values in reader.number_chunks():
+                if count + len(values) > num_profiles:
+                    raise ValueError("Game file has more outcomes than the", num_profiles, "plays")
+                c_order = gambit_to_c_order(shape, np.arange(count, count + len(values)))
+                payoffs = outcomes[values.astype(np.int64)]
+                for n in range(N):
+                    flat[n * num_profiles + c_order] = payoffs[:, n]
+                count += len(values)
+            expected = num_profiles
+        else:
+            # payoff format: the first payoff was already read as a token
+            reader.position -= len(token or "")
+            for values in reader.number_chunks():
+                if count + len(values) > N * num_profiles:
+                    raise ValueError("Game file has more payoffs than the", N * num_profiles, "expected")
+                positions = np.arange(count, count + len(values))
+                flat[positions % N * num_profiles + gambit_to_c_order(shape, positions // N)] = values
+                count += len(values)
+            expected = N * num_profiles
+        if count != expected:
+            raise ValueError("Game file has " + str(count) + " values, expected", expected)
+    return {'players': players, 'strategies': strategies, 'utilities': utilities}
+
+###
+# INPUTS
+# path: a NumPy .npz archive holding either one "utilities" array of shape (N, len(S[0]), ..., len(S[N-1])) or one array per player
+#   of shape (len(S[0]), ..., len(S[N-1])) in player order, and optionally "players", an array of player names
+#
+# RETURNS
+# a dictionary with the player names, the strategy names of each player and the payoff tensor
+# per player arrays are read one at a time into the preallocated tensor
+###
+def load_npz(path):
+    with np.load(path) as archive:
+        keys = [key for key in archive.files if key != "players"]
+        if "utilities" in archive.files:
+            utilities = np.asarray(archive["utilities"], dtype=float)
+        else:
+            first = archive[keys[0]]
+            utilities = np.empty((len(keys),) + first.shape)
+            utilities[0] = first
+            for n, key in enumerate(keys[1:], 1):
+                utilities[n] = archive[key]
+        if "players" in archive.files:
+            players = [str(name) for name in archive["players"]]
+        else:
+            players = keys if "utilities" not in archive.files else [str(n + 1) for n in range(utilities.shape[0])]
+    if len(players) != utilities.shape[0] or utilities.ndim != len(players) + 1:
+        raise ValueError("Payoff tensor must have one axis per player after the player axis", utilities.shape)
+    return {'players': players, 'strategies': [[str(i + 1) for i in range(size)] for size in utilities.shape[1:]], 'utilities': utilities}
+
+###
+# INPUTS
+# path: a .nfg or .npz game file
+#
+# RETURNS
+# a dictionary with the player names, the strategy names of each player and the payoff tensor
+###
+def load_game(path):
+    if str(path).endswith(".nfg"):
+        return load_nfg(path)
+    if str(path).endswith(".npz"):
+        return load_npz(path)
+    raise ValueError("Unknown game file type", path)
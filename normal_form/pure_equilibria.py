@@ -0,0 +1,77 @@
+# pure Nash equilibria from vectorized best response scans, and exact potentials of potential games
+import numpy as np
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1])) as from build_payoff_tensor, payoffs[n] is u[n] of every play
+# tolerance: how far below the best response a strategy can be and still count as one
+#
+# RETURNS
+# a boolean array of the same shape where masks[n][w] is whether player n's strategy in play w is a best response to the others' strategies in w
+###
+def best_response_masks(payoffs, tolerance=1e-12):
+    payoffs = np.asarray(payoffs, dtype=float)
+    masks = np.empty(payoffs.shape, dtype=bool)
+    for n in range(payoffs.shape[0]):
+        masks[n] = payoffs[n] >= np.max(payoffs[n], axis=n, keepdims=True) - tolerance
+    return masks
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# tolerance: how far below the best response a strategy can be and still count as one
+#
+# RETURNS
+# an array of shape (number of pure equilibria, N), each row the strategy indices of a play where every player best responds
+###
+def find_pure_equilibria(payoffs, tolerance=1e-12):
+    return np.argwhere(np.all(best_response_masks(payoffs, tolerance), axis=0))
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# tolerance: the largest error in any player's payoff difference the potential may make
+#
+# RETURNS
+# an exact potential P, an array of the shape of one play, with u[n](w') - u[n](w) = P(w') - P(w) whenever w and w' only differ in
+# player n's strategy, or None if the game is not an exact potential game
+# P is built along the path that moves each player in turn from strategy 0 to their strategy in w, then checked by u[n] - P being
+# constant along player n's axis for every n
+###
+def find_potential(payoffs, tolerance=1e-9):
+    payoffs = np.asarray(payoffs, dtype=float)
+    N = payoffs.shape[0]
+    potential = np.zeros(payoffs.shape[1:])
+    for n in range(N):
+        # u[n] of the plays where every player after n still plays strategy 0
+        path = payoffs[n][tuple(slice(None) if v <= n else slice(0, 1) for v in range(N))]
+        potential = potential + (path - np.take(path, [0], axis=n))
+    scale = max(1, np.max(np.abs(payoffs)))
+    for n in range(N):
+        if np.max(np.ptp(payoffs[n] - potential, axis=n)) > tolerance * scale:
+            return None
+    return potential
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# tolerance: how far below the best response a strategy can be and still count as one
+#
+# RETURNS
+# a dictionary with every pure equilibrium as rows of strategy indices, the exact potential if there is one, and the best equilibrium,
+# the one maximizing the potential when there is one and otherwise the first found, as a mixed strategy profile, None if there is no pure equilibrium
+###
+def solve_pure(payoffs, tolerance=1e-12):
+    payoffs = np.asarray(payoffs, dtype=float)
+    equilibria = find_pure_equilibria(payoffs, tolerance)
+    potential = find_potential(payoffs)
+    best = None
+    if potential is not None:
+        # a maximum of the potential is always a pure equilibrium
+        best = np.unravel_index(np.argmax(potential), potential.shape)
+    elif len(equilibria):
+        best = equilibria[0]
+    x = None
+    if best is not None:
+        x = [[1.0 if i == best[n] else 0.0 for i in range(size)] for n, size in enumerate(payoffs.shape[1:])]
+    return {'equilibria': equilibria, 'potential': potential, 'x': x}
@@ -0,0 +1,85 @@
+# constant-sum detection and per-player minimax LPs for 2 player constant-sum games
+import numpy as np
+from scipy.optimize import linprog
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1])) as from build_payoff_tensor, payoffs[n] is u[n] of every play
+# tolerance: the largest spread of the payoff sum over the plays, relative to its size, still considered constant
+#
+# RETURNS
+# the sum of every player's payoff if it is the same for every play, None otherwise
+###
+def find_constant_sum(payoffs, tolerance=1e-9):
+    total = np.sum(payoffs, axis=0)
+    if np.ptp(total) > tolerance * max(1, np.max(np.abs(total))):
+        return None
+    return float(np.mean(total))
+
+###
+# INPUTS
+# payoffs: the payoff tensor of a 2 player game
+# n: the player to find a maximin strategy for
+#
+# RETURNS
+# the maximin mixed strategy of player n, an array of length S[n], and the value it guarantees n
+# the LP has S[n] + 1 variables and one row per pure strategy of the opponent: maximize v s.t. x[n] @ u[n](., j) >= v for every j
+###
+def solve_maximin_strategy(payoffs, n):
+    A = payoffs[n] if n == 0 else payoffs[n].T
+    num_strategies, num_responses = A.shape
+    c = np.zeros(num_strategies + 1)
+    c[-1] = -1
+    A_ub = np.hstack([-A.T, np.ones((num_responses, 1))])
+    A_eq = np.append(np.ones(num_strategies), 0)[None, :]
+    bounds = [(0, None)] * num_strategies + [(None, None)]
+    res = linprog(c, A_ub=A_ub, b_ub=np.zeros(num_responses), A_eq=A_eq, b_eq=np.array([1]), bounds=bounds, method='highs')
+    if res.x is None:
+        raise ValueError("Linear programming failed to find a solution", res.message)
+    x = np.maximum(res.x[:-1], 0)
+    return x / np.sum(x), float(res.x[-1])
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# x: the mixed strategy profile, array dimension N, each element i an array of length S[i]
+#
+# RETURNS
+# an array of length N where element n is the most player n gains by deviating from x[n] to a pure strategy,
+# the profile's exploitability is the sum and it is 0 exactly at Nash equilibria
+###
+def deviation_gains(payoffs, x):
+    gains = np.empty(len(x))
+    for n in range(len(x)):
+        utilities = payoffs[n]
+        # contract the other players' axes from the last to the first so the remaining axis indices do not shift
+        for v in reversed(range(len(x))):
+            if v != n:
+                utilities = np.tensordot(utilities, x[v], axes=([v], [0]))
+        gains[n] = np.max(utilities) - np.dot(x[n], utilities)
+    return gains
+
+###
+# INPUTS
+# payoffs: a payoff tensor of shape (N, len(S[0]), ..., len(S[N-1]))
+# tolerance: the relative tolerance for the payoff sum to be constant
+# check_tolerance: the largest exploitability accepted for the minimax profile
+#
+# RETURNS
+# None unless the game is a 2 player constant-sum game, otherwise a dictionary with the minimax profile x, which is a Nash equilibrium
+# and, as a product distribution, an optimal correlated equilibrium of any welfare objective, since every CE pays each player their value,
+# the values guaranteed to each player, the constant sum and the exploitability of x
+###
+def solve_zero_sum(payoffs, tolerance=1e-9, check_tolerance=1e-6):
+    payoffs = np.asarray(payoffs, dtype=float)
+    if payoffs.shape[0] != 2:
+        return None
+    constant = find_constant_sum(payoffs, tolerance)
+    if constant is None:
+        return None
+    solutions = [solve_maximin_strategy(payoffs, n) for n in range(2)]
+    x = [solution[0] for solution in solutions]
+    exploitability = float(np.sum(deviation_gains(payoffs, x)))
+    if exploitability > check_tolerance * max(1, np.max(np.abs(payoffs))):
+        raise ValueError("Minimax profile is exploitable", exploitability)
+    return {'x': x, 'values': [solution[1] for solution in solutions], 'constant': constant, 'exploitability': exploitability}